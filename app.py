@@ -1,23 +1,37 @@
+import os
+import tempfile
 import gradio as gr
-from backend import chatbot_interface, analyze_image
-
-# Function to handle interactive chatbot messages
-def interactive_chatbot(message, history=None):
+from batch import analyze_batch, write_results
+from registry import registry
+from metrics import metrics, start_metrics_server
+from jobs import get_job_queue
+import report  # registers the "image_report" job task
+from video import BoxTracker, track_video
+from backend import chatbot_interface_stream, analyze_image_or_reuse, reset_chat
+
+# Function to stream chatbot replies into the chat window as they arrive
+def interactive_chatbot_stream(message, history=None, request: gr.Request = None):
     if history is None:
         history = []
-    response, updated_history = chatbot_interface(message, history)
-    return updated_history, updated_history
+    session_id = request.session_hash if request is not None else None
+    for response, updated_history in chatbot_interface_stream(message, history, session_id):
+        yield updated_history, updated_history
 
 # Function to clear the chatbot
-def clear_chat():
-    return "", []
+def clear_chat(request: gr.Request = None):
+    if request is not None:
+        reset_chat(request.session_hash)
+    return "", [], []
 
 # Function to analyze the image with a prompt
 def analyze_image_with_prompt(image_path, prompt):
     if not image_path or not prompt:
         return "Please upload an image and provide a prompt for analysis."
     try:
-        image_analysis = analyze_image(image_path, prompt)  # Pass prompt to backend analyze_image
+        # A near-identical image (recompressed, resized, screenshotted) asked the same question reuses its analysis
+        image_analysis, similarity = analyze_image_or_reuse(image_path, prompt)
+        if similarity is not None:
+            return f"Image Analysis (reused from a {similarity:.0%} similar image):\n{image_analysis}\n\nPrompt Analysis:\n{prompt}"
         return f"Image Analysis:\n{image_analysis}\n\nPrompt Analysis:\n{prompt}"
     except Exception as e:
         return f"Error analyzing image with prompt: {str(e)}"
@@ -26,6 +40,71 @@ def analyze_image_with_prompt(image_path, prompt):
 def clear_analysis_history():
     return None, "Analysis history cleared."
 
+# Function to analyze a zip of images, streaming progress and the results file
+def analyze_image_batch(archive_path, prompt, workers, output_format):
+    if not archive_path or not prompt:
+        yield "Please upload a zip of images and provide a prompt for analysis.", None
+        return
+    fd, output_path = tempfile.mkstemp(prefix="resqhub_batch_", suffix=f".{output_format}")
+    done = failed = 0
+    try:
+        with os.fdopen(fd, "w", newline="") as out:
+            results = analyze_batch(archive_path, prompt, max_workers=int(workers))
+            for result in write_results(results, out, output_format):
+                done += 1
+                failed += result["status"] != "ok"
+                yield f"Analyzed {done} images ({failed} failed). Last: {result['image']}", None
+        yield f"Finished: {done} images analyzed, {failed} failed.", output_path
+    except Exception as e:
+        yield f"Error analyzing batch: {str(e)}", None
+
+VIDEO_SUMMARY_FIELDS = ["track_id", "class", "first_seen_sec", "last_seen_sec", "detections", "max_confidence"]
+
+# Function to detect and track objects in a video, streaming annotated frames and then the per-track summary
+def detect_objects_video(video_path, detect_every, stream_every=5):
+    if not video_path:
+        yield None, "Please upload a video.", None
+        return
+    tracker = BoxTracker()
+    image = None
+    stats = None
+    try:
+        for result in track_video(video_path, detect_every=int(detect_every), annotate_every=stream_every, tracker=tracker):
+            stats = result["stats"]
+            if result["image"] is not None:
+                image = result["image"]
+                yield image, f"Frame {result['frame']} ({result['time']}s): {len(result['tracks'])} objects, {stats['fps']} fps", None
+    except Exception as e:
+        yield image, f"Error in video detection: {str(e)}", None
+        return
+    if stats is None:
+        yield None, "Error: No frames could be decoded from the video.", None
+        return
+    summary = [[track[key] for key in VIDEO_SUMMARY_FIELDS] for track in tracker.summary()]
+    yield image, (
+        f"Processed {stats['frames']} frames in {stats['seconds']}s ({stats['fps']} fps). "
+        f"YOLO ran on {stats['detections']} frames ({stats['scene_cuts']} on scene changes), "
+        f"{len(summary)} objects tracked."
+    ), summary
+
+# Function to queue a PDF report, so the handler returns right away
+def queue_image_report(image_path, prompt):
+    if not image_path or not prompt:
+        return "", "Please upload an image and provide a prompt for the report.", None
+    job_id = get_job_queue().submit("image_report", image_path, prompt)
+    return job_id, f"Queued as job {job_id}.", None
+
+# Function to check on a queued report
+def image_report_status(job_id):
+    job = get_job_queue().status((job_id or "").strip())
+    if job is None:
+        return "Unknown job id.", None
+    if job["status"] == "done":
+        return job["result"]["analysis"], job["result"]["report"]
+    if job["status"] == "failed":
+        return f"Error generating report: {job['error']}", None
+    return f"{job['status'].capitalize()} ({job['progress']:.0%}) {job['message']}".strip(), None
+
 # Main Gradio Interface
 with gr.Blocks(css="styles.css") as app:
     # Tabs for different functionalities
@@ -39,10 +118,12 @@ with gr.Blocks(css="styles.css") as app:
                 clear_button = gr.Button("Clear Chat")
 
         chatbot_output = gr.Chatbot(label="VisionAI Chatbot", type="messages", show_label=True)
+        chat_history = gr.State([])
 
-        send_button.click(interactive_chatbot, inputs=[user_message, gr.State()], outputs=[chatbot_output, gr.State()])
-        user_message.submit(interactive_chatbot, inputs=[user_message, gr.State()], outputs=[chatbot_output, gr.State()])
-        clear_button.click(clear_chat, inputs=None, outputs=[user_message, chatbot_output])
+        send_event = send_button.click(interactive_chatbot_stream, inputs=[user_message, chat_history], outputs=[chatbot_output, chat_history])
+        submit_event = user_message.submit(interactive_chatbot_stream, inputs=[user_message, chat_history], outputs=[chatbot_output, chat_history])
+        # Clearing also cancels a reply that is still streaming, which stops the upstream generation
+        clear_button.click(clear_chat, inputs=None, outputs=[user_message, chatbot_output, chat_history], cancels=[send_event, submit_event])
 
     with gr.Tab("Image Analysis"):
         gr.Markdown("## 🖼 Image Analysis with Prompt")
@@ -57,9 +138,65 @@ with gr.Blocks(css="styles.css") as app:
         prompt_input.submit(analyze_image_with_prompt, inputs=[image_input, prompt_input], outputs=result_output)
         clear_analysis.click(clear_analysis_history, inputs=None, outputs=[image_input, result_output])
 
+    with gr.Tab("Batch Analysis"):
+        gr.Markdown("## 🗂 Batch Image Analysis")
+        batch_input = gr.File(label="Upload a Zip of Images", file_types=[".zip"], type="filepath")
+        batch_prompt = gr.Textbox(placeholder="Describe what to analyze in every image...", label="Your Prompt")
+        with gr.Row():
+            batch_workers = gr.Slider(1, 16, value=4, step=1, label="Concurrent Requests")
+            batch_format = gr.Radio(["jsonl", "csv"], value="jsonl", label="Output Format")
+        batch_button = gr.Button("🔍 Analyze Batch", variant="primary")
+        batch_status = gr.Textbox(label="Progress")
+        batch_output = gr.File(label="Results")
+
+        batch_button.click(analyze_image_batch, inputs=[batch_input, batch_prompt, batch_workers, batch_format], outputs=[batch_status, batch_output])
+
+    with gr.Tab("Video Detection"):
+        gr.Markdown("## 🎥 Video Object Detection")
+        video_input = gr.Video(label="Upload a Video")
+        video_detect_every = gr.Slider(1, 30, value=5, step=1, label="Run YOLO Every N Frames")
+        video_button = gr.Button("🔍 Detect Objects", variant="primary")
+        video_frame = gr.Image(label="Annotated Frame")
+        video_status = gr.Textbox(label="Progress")
+        video_summary = gr.Dataframe(headers=VIDEO_SUMMARY_FIELDS, label="Tracked Objects")
+
+        # Between YOLO runs boxes are carried forward by the tracker, so clips process several times faster
+        video_button.click(detect_objects_video, inputs=[video_input, video_detect_every], outputs=[video_frame, video_status, video_summary])
+
+    with gr.Tab("PDF Report"):
+        gr.Markdown("## 📄 PDF Medical Report")
+        report_image = gr.Image(type="filepath", label="Upload Image")
+        report_prompt = gr.Textbox(placeholder="Describe what the report should cover...", label="Your Prompt")
+        report_button = gr.Button("📄 Generate Report", variant="primary")
+        report_job_id = gr.Textbox(label="Job ID")
+        report_status_button = gr.Button("Check Status")
+        report_status = gr.Textbox(label="Status")
+        report_output = gr.File(label="Report")
+
+        # Reports run on the background job queue, not on the threads serving chat and analysis
+        report_button.click(queue_image_report, inputs=[report_image, report_prompt], outputs=[report_job_id, report_status, report_output])
+        report_status_button.click(image_report_status, inputs=report_job_id, outputs=[report_status, report_output])
+
     gr.Markdown("Developed by Sangarsh 2.0", elem_id="footer")
 
 if __name__ == "__main__":
+    # Load models in the background while the UI starts, e.g. WARM_MODELS=gemini,yolo
+    warm_models = [name for name in os.getenv("WARM_MODELS", "gemini").split(",") if name]
+    if warm_models:
+        registry.warm(warm_models)
+
+    # Resume report jobs left over from the previous run
+    get_job_queue()
+
+    # Prometheus metrics next to the UI, METRICS_PORT=0 disables them
+    metrics_port = int(os.getenv("METRICS_PORT", "9464"))
+    if metrics_port:
+        metrics.add_collector(lambda: {
+            f"resqhub_model_load_seconds_{name}": stats["load_seconds"]
+            for name, stats in registry.stats().items()
+        })
+        metrics.add_collector(lambda: get_job_queue().stats())
+        start_metrics_server(metrics_port)
     app.launch(share=True, debug=True)
 
 
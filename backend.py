@@ -4,18 +4,15 @@
 
 
 import os
+import time
 import google.generativeai as genai
-from PIL import Image
-import base64
-import io
-
-# Fetch API Key securely
-api_key = os.getenv("GEMINI_API_KEY")
-if not api_key:
-    raise ValueError("API key not found. Please set the GEMINI_API_KEY environment variable.")
-
-# Configure Gemini API
-genai.configure(api_key=api_key)
+from sessions import ChatSessionManager, stream_text
+from cache import DiskCache, LRUCache, ResponseCache, SingleFlight, make_key
+from dedup import NearDuplicateIndex, image_hashes
+from imageprep import prepare_image, upload_stats
+from registry import registry
+from metrics import STAGE_SECONDS, metrics, span
+from routing import Route, Router, classify_text
 
 # Model Configuration
 generation_config = {
@@ -27,28 +24,172 @@ generation_config = {
 }
 
 model_name = "gemini-2.0-flash"
-model = genai.GenerativeModel(
-    model_name=model_name,
-    generation_config=generation_config,
+
+# Function to configure Gemini and build the model, run on first use
+def _load_model():
+    # Fetch API Key securely
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise ValueError("API key not found. Please set the GEMINI_API_KEY environment variable.")
+
+    # Configure Gemini API
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(
+        model_name=model_name,
+        generation_config=generation_config,
+    )
+
+registry.register("gemini", _load_model)
+
+# Function to get the shared Gemini model
+def get_model():
+    return registry.get("gemini")
+
+# Model and generation config per request class. Short questions and images don't need 8192 tokens
+# at temperature 1, and each route falls back to a faster one while it breaches its latency SLO.
+fast_model_name = os.getenv("GEMINI_FAST_MODEL", "gemini-2.0-flash-lite")
+focused_config = {**generation_config, "temperature": 0.4}
+router = Router(
+    [
+        Route("triage", fast_model_name, {**focused_config, "max_output_tokens": 1024},
+              slo_seconds=float(os.getenv("SLO_TRIAGE_SECONDS", "3"))),
+        Route("chat", model_name, generation_config,
+              slo_seconds=float(os.getenv("SLO_CHAT_SECONDS", "10")), fallback="triage"),
+        Route("image_fast", fast_model_name, {**focused_config, "max_output_tokens": 1024},
+              slo_seconds=float(os.getenv("SLO_IMAGE_FAST_SECONDS", "6"))),
+        Route("image", model_name, {**focused_config, "max_output_tokens": 2048},
+              slo_seconds=float(os.getenv("SLO_IMAGE_SECONDS", "12")), fallback="image_fast"),
+        Route("report", model_name, generation_config,
+              slo_seconds=float(os.getenv("SLO_REPORT_SECONDS", "45")), fallback="image"),
+    ],
+    classes={"triage": "triage", "chat": "chat", "image": "image", "report": "report"},
+    window_seconds=float(os.getenv("ROUTING_WINDOW_SECONDS", "300")),
 )
 
-chat_session = model.start_chat(history=[])
+# Function to build a route's model, sharing the default model when the route matches it
+def _load_route_model(route):
+    model = get_model()  # Configures the API key
+    if route.model_name == model_name and route.generation_config == generation_config:
+        return model
+    return genai.GenerativeModel(model_name=route.model_name, generation_config=route.generation_config)
+
+for _route in router.routes.values():
+    registry.register(f"gemini_{_route.name}", lambda route=_route: _load_route_model(route))
+
+# Function to get the model serving a route
+def get_route_model(route):
+    return registry.get(f"gemini_{route.name}")
+
+# Largest image side sent to the model, bigger uploads are downscaled
+max_image_side = int(os.getenv("MAX_IMAGE_SIDE", "2048"))
+
+# Cache of image analyses, keyed by image bytes + normalized prompt + model config
+analysis_cache = ResponseCache(
+    memory=LRUCache(max_items=int(os.getenv("ANALYSIS_CACHE_ITEMS", "512"))),
+    disk=DiskCache(
+        os.getenv("ANALYSIS_CACHE_PATH", os.path.join("cache", "analysis_cache.sqlite")),
+        max_bytes=int(os.getenv("ANALYSIS_CACHE_BYTES", str(256 * 1024 * 1024))),
+    ) if os.getenv("ANALYSIS_CACHE_PATH", "") != "off" else None,
+)
+
+# Earlier analyses by perceptual hash, so recompressed, resized or screenshotted repeats can reuse them.
+# IMAGE_DEDUP_SIMILARITY is the fraction of matching hash bits needed. Off by default: different scans of
+# the same kind (e.g. two chest X-rays) can hash alike, and a reused answer would describe the wrong patient.
+# Only enable it, with a strict value such as 0.98, where repeats of the very same image are expected.
+image_dedup_similarity = os.getenv("IMAGE_DEDUP_SIMILARITY", "off")
+duplicate_index = NearDuplicateIndex(
+    similarity=float(image_dedup_similarity),
+    max_items=int(os.getenv("IMAGE_DEDUP_ITEMS", "10000")),
+) if image_dedup_similarity != "off" else None
+
+# Identical requests already in flight share one upstream call instead of each making their own
+image_flight = SingleFlight()
+text_flight = SingleFlight()
+
+# One chat per Gradio session, with capped history and LRU/TTL eviction
+session_manager = ChatSessionManager(
+    get_model,
+    max_sessions=int(os.getenv("CHAT_MAX_SESSIONS", "500")),
+    ttl_seconds=float(os.getenv("CHAT_SESSION_TTL", "1800")),
+    max_history_messages=int(os.getenv("CHAT_MAX_HISTORY", "20")),
+    memory_budget_chars=int(os.getenv("CHAT_MEMORY_BUDGET", "20000000")),
+)
+
+# Export cache, session and upload counters with the metrics
+metrics.add_collector(lambda: {
+    **{f"resqhub_analysis_cache_{name}": value for name, value in analysis_cache.stats().items()},
+    **{f"resqhub_chat_{name}": value for name, value in session_manager.stats().items()},
+    **{f"resqhub_image_upload_{name}": value for name, value in upload_stats().items()},
+    **{f"resqhub_image_singleflight_{name}": value for name, value in image_flight.stats().items()},
+    **{f"resqhub_text_singleflight_{name}": value for name, value in text_flight.stats().items()},
+    **({f"resqhub_image_dedup_{name}": value for name, value in duplicate_index.stats().items()}
+       if duplicate_index is not None else {}),
+    **{
+        f"resqhub_route_{route}_{name}": value
+        for route, stats in router.stats().items()
+        for name, value in stats.items()
+    },
+})
+
+# Function to run a stateless text query on a route
+def _generate_text(prompt, route):
+    with span("gemini_generate_text"), router.track(route):
+        response = get_route_model(route).generate_content(prompt)
+    return response.text if hasattr(response, "text") else "No response received."
 
 # Function to handle text-based chat
-def text_chat(prompt):
+def text_chat(prompt, session_id=None):
     try:
-        response = chat_session.send_message(prompt)
+        if session_id is None:
+            # Stateless query, no conversation history to keep, so identical prompts can share a call
+            route = router.choose(classify_text(prompt))
+            key = make_key(b"", prompt, route.config())
+            return text_flight.do(key, _generate_text, prompt, route)
+        # Conversations stay on the chat route: triage's short, low-temperature budget would cut
+        # ordinary turns off, and one conversation shouldn't switch models from turn to turn
+        route = router.choose("chat")
+        with span("gemini_chat"), router.track(route):
+            response = session_manager.send_message(session_id, prompt, model=get_route_model(route))
         return response.text if hasattr(response, "text") else "No response received."
     except Exception as e:
         return f"Error: {str(e)}"
 
+# Function to stream a text-based chat reply, yielding the text received so far
+def text_chat_stream(prompt, session_id=None):
+    text = ""
+    started = time.perf_counter()
+    try:
+        route = router.choose("chat" if session_id is not None else classify_text(prompt))
+        with span("gemini_chat_stream"), router.track(route):
+            if session_id is None:
+                # Closing this generator (Clear Chat) also cancels the upstream stream
+                chunks = stream_text(get_route_model(route).generate_content(prompt, stream=True))
+            else:
+                chunks = session_manager.stream_message(session_id, prompt, model=get_route_model(route))
+            try:
+                for chunk in chunks:
+                    if not text:
+                        STAGE_SECONDS.observe(time.perf_counter() - started, "gemini_chat_first_token")
+                    text += chunk
+                    yield text
+            finally:
+                chunks.close()  # Runs the upstream cancellation right away when the reply is abandoned
+        if not text:
+            yield "No response received."
+    except Exception as e:
+        yield f"Error: {str(e)}"
+
+# Function to forget a user's conversation, stopping any reply in progress
+def reset_chat(session_id):
+    session_manager.reset(session_id)
+
 # Function for chatbot interaction
-def chatbot_interface(message, history=None):
+def chatbot_interface(message, history=None, session_id=None):
     if history is None:
         history = []
     history.append({"role": "user", "content": message})
     try:
-        response = text_chat(message)
+        response = text_chat(message, session_id)
         history.append({"role": "assistant", "content": response})
         return response, history
     except Exception as e:
@@ -56,21 +197,99 @@ def chatbot_interface(message, history=None):
         history.append({"role": "assistant", "content": error_message})
         return error_message, history
 
-# Function to analyze an image with the model
-def analyze_image(image_path, prompt):
+# Function for streaming chatbot interaction, yields (partial response, history)
+def chatbot_interface_stream(message, history=None, session_id=None):
+    if history is None:
+        history = []
+    history.append({"role": "user", "content": message})
+    history.append({"role": "assistant", "content": ""})
+    response = ""
     try:
-        # Open and convert image to base64
-        image = Image.open(image_path)
-        buffered = io.BytesIO()
-        image.save(buffered, format="PNG")
-        img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
+        for response in text_chat_stream(message, session_id):
+            history[-1] = {"role": "assistant", "content": response}
+            yield response, history
+    except Exception as e:
+        response = f"Error: {str(e)}"
+        history[-1] = {"role": "assistant", "content": response}
+        yield response, history
 
-        # Construct multimodal request
-        combined_prompt = f"Here is an image. Analyze it based on: {prompt}"
+# Model settings that affect an image analysis, part of its cache key
+def _image_config(route):
+    return {"max_side": max_image_side, **route.config()}
 
-        response = model.generate_content([combined_prompt, img_str])
-        
-        return response.text if hasattr(response, "text") else "No response received."
+# Function to analyze an image, reusing the analysis of a near-identical earlier upload with the same prompt
+def analyze_image_or_reuse(image_path, prompt, request_class="image"):
+    """
+    Returns:
+        Tuple: The analysis, and the similarity of the earlier upload it was reused from (None if analyzed now).
+    """
+    # One route for both the lookup and the analysis, so they agree on the cache key
+    route = router.choose(request_class)
+    with span("image_read"), open(image_path, "rb") as f:
+        image_bytes = f.read()
+    hashes = None
+    if duplicate_index is not None:
+        with span("image_dedup_lookup"):
+            try:
+                hashes = image_hashes(image_bytes)
+            except Exception:
+                pass  # Not decodable here, let the regular analysis report it
+            match = duplicate_index.find(make_key(b"", prompt, _image_config(route)), hashes) if hashes else None
+        if match is not None:
+            cache_key, similarity = match
+            # The index only points into the analysis cache, which may have evicted the entry since
+            analysis = analysis_cache.get(cache_key)
+            if analysis is not None:
+                return analysis, similarity
+    return analyze_image_bytes(image_bytes, prompt, route=route, hashes=hashes), None
+
+# Function to analyze raw image bytes, raising on failure so callers can retry.
+# `cache_prompt` is the prompt the answer is cached under, for callers whose `prompt` adds context that
+# varies between runs of the same question (defaults to `prompt`). `route` and `hashes` (perceptual
+# hashes of the image) can be passed in when the caller already has them.
+@span("analyze_image")
+def analyze_image_bytes(image_bytes, prompt, request_class="image", cache_prompt=None, route=None, hashes=None):
+    route = route or router.choose(request_class)
+    cache_prompt = prompt if cache_prompt is None else cache_prompt
+    # Repeat submissions of the same image and prompt are served from the cache
+    with span("image_cache_lookup"):
+        cache_key = make_key(image_bytes, cache_prompt, _image_config(route))
+        cached = analysis_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    return image_flight.do(
+        cache_key, _analyze_image_uncached, image_bytes, prompt, route, cache_key, cache_prompt, hashes
+    )
+
+# Function to run an image analysis against the route's model and cache the result
+def _analyze_image_uncached(image_bytes, prompt, route, cache_key, cache_prompt, hashes=None):
+    # Send the original bytes when possible, re-encoding only to rotate or downscale
+    with span("image_preprocess"):
+        prepared = prepare_image(image_bytes, max_side=max_image_side)
+
+    # Construct multimodal request
+    combined_prompt = f"Here is an image. Analyze it based on: {prompt}"
+
+    with span("gemini_generate_image"), router.track(route):
+        response = get_route_model(route).generate_content([combined_prompt, prepared.as_part()])
+
+    if not hasattr(response, "text"):
+        return "No response received."
+    analysis_cache.put(cache_key, response.text)
+    if duplicate_index is not None:
+        try:
+            hashes = hashes or image_hashes(image_bytes)
+            duplicate_index.add(make_key(b"", cache_prompt, _image_config(route)), hashes, cache_key)
+        except Exception as e:
+            print("Error indexing image for duplicate detection:", e)
+    return response.text
+
+# Function to analyze an image with the model
+def analyze_image(image_path, prompt):
+    try:
+        with span("image_read"), open(image_path, "rb") as f:
+            image_bytes = f.read()
+        return analyze_image_bytes(image_bytes, prompt)
     except Exception as e:
         return f"Error analyzing image: {str(e)}"
 
@@ -0,0 +1,234 @@
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import threading
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".heic", ".heif", ".bmp", ".tif", ".tiff", ".gif"}
+
+RESULT_FIELDS = ["image", "status", "analysis", "error", "attempts", "seconds"]
+
+
+class TokenBucket:
+    """
+    Thread-safe token-bucket rate limiter.
+
+    Args:
+        rate (float): Tokens added per second.
+        capacity (float): Maximum burst size.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Block until a token is available, then take it.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_seconds = (1 - self._tokens) / self.rate
+            time.sleep(wait_seconds)
+
+
+def is_quota_error(error):
+    """
+    Return True for rate-limit / quota errors that are worth retrying.
+    """
+    if type(error).__name__ in ("ResourceExhausted", "TooManyRequests", "ServiceUnavailable"):
+        return True
+    message = str(error).lower()
+    return "429" in message or "quota" in message or "rate limit" in message
+
+
+def backoff_delay(attempt, base_delay=1.0, max_delay=60.0):
+    """
+    Exponential backoff with full jitter for the given retry attempt (0-based).
+    """
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+def call_with_retries(fn, retries=5, base_delay=1.0, max_delay=60.0, limiter=None, should_retry=is_quota_error):
+    """
+    Call `fn()`, retrying with exponential backoff while `should_retry(error)` holds.
+
+    Returns:
+        Tuple: The result of `fn()` and the number of attempts made.
+    """
+    attempt = 0
+    while True:
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            return fn(), attempt + 1
+        except Exception as e:
+            if attempt >= retries or not should_retry(e):
+                e.attempts = attempt + 1
+                raise
+            time.sleep(backoff_delay(attempt, base_delay, max_delay))
+            attempt += 1
+
+
+@contextmanager
+def open_images(source):
+    """
+    List the images in a directory (recursively) or a zip archive, closing the archive on exit.
+
+    Args:
+        source (str): Directory or .zip path.
+    Yields:
+        list: (name, read) pairs, where `read()` returns the image bytes.
+    """
+    if os.path.isdir(source):
+        items = []
+        for root, _, files in os.walk(source):
+            for name in sorted(files):
+                if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                    path = os.path.join(root, name)
+                    items.append((os.path.relpath(path, source), lambda path=path: _read_file(path)))
+        yield sorted(items, key=lambda item: item[0])
+        return
+
+    if not zipfile.is_zipfile(source):
+        raise ValueError(f"{source} is neither a directory nor a zip archive.")
+
+    with zipfile.ZipFile(source) as archive:
+        lock = threading.Lock()
+
+        def read_member(name):
+            # ZipFile shares one file handle, so reads from worker threads are serialized
+            with lock:
+                return archive.read(name)
+
+        yield [
+            (info.filename, lambda name=info.filename: read_member(name))
+            for info in archive.infolist()
+            if not info.is_dir() and os.path.splitext(info.filename)[1].lower() in IMAGE_EXTENSIONS
+        ]
+
+
+def _read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def analyze_batch(source, prompt, analyze=None, max_workers=4, requests_per_minute=60, retries=5):
+    """
+    Analyze every image in a directory or zip archive with the same prompt.
+
+    Requests are fanned out over a bounded thread pool and throttled by a
+    token bucket; quota errors are retried with exponential backoff. Only a
+    small window of images is in flight at once, so memory stays bounded for
+    large batches.
+
+    Args:
+        source (str): Directory or .zip of images.
+        prompt (str): Prompt applied to every image.
+        analyze (callable): `analyze(image_bytes, prompt)`, defaults to backend.analyze_image_bytes.
+        max_workers (int): Concurrent requests.
+        requests_per_minute (float): Upstream request budget.
+        retries (int): Retries per image on quota errors.
+    Yields:
+        dict: One result per image, in completion order.
+    """
+    if analyze is None:
+        from backend import analyze_image_bytes as analyze
+
+    limiter = TokenBucket(requests_per_minute / 60.0, capacity=max_workers)
+
+    def run(name, read):
+        started = time.perf_counter()
+        try:
+            image_bytes = read()
+            analysis, attempts = call_with_retries(
+                lambda: analyze(image_bytes, prompt), retries=retries, limiter=limiter
+            )
+            return {"image": name, "status": "ok", "analysis": analysis, "error": "",
+                    "attempts": attempts, "seconds": round(time.perf_counter() - started, 3)}
+        except Exception as e:
+            return {"image": name, "status": "error", "analysis": "", "error": str(e),
+                    "attempts": getattr(e, "attempts", 1), "seconds": round(time.perf_counter() - started, 3)}
+
+    # The pool is shut down before the archive is closed, so no read outlives it
+    with open_images(source) as images, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        items = iter(images)
+        pending = set()
+        for name, read in items:
+            pending.add(executor.submit(run, name, read))
+            if len(pending) >= max_workers * 2:
+                break
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+                for name, read in items:
+                    pending.add(executor.submit(run, name, read))
+                    break
+
+
+def write_results(results, out, fmt="jsonl"):
+    """
+    Write results to a text stream as they arrive, flushing after each row.
+
+    Args:
+        results (iterable): Result dicts from `analyze_batch`.
+        out (file): Open text stream.
+        fmt (str): "jsonl" or "csv".
+    Yields:
+        dict: Each result after it has been written.
+    """
+    writer = None
+    if fmt == "csv":
+        writer = csv.DictWriter(out, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+    for result in results:
+        if writer is not None:
+            writer.writerow(result)
+        else:
+            out.write(json.dumps(result) + "\n")
+        out.flush()
+        yield result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze a directory or zip of images with Gemini.")
+    parser.add_argument("source", help="Directory or .zip archive of images")
+    parser.add_argument("--prompt", required=True, help="Prompt applied to every image")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default="jsonl")
+    parser.add_argument("--output", help="Output file (defaults to stdout)")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rpm", type=float, default=60, help="Requests per minute")
+    parser.add_argument("--retries", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    out = open(args.output, "w", newline="") if args.output else sys.stdout
+    try:
+        results = analyze_batch(args.source, args.prompt, max_workers=args.workers,
+                                requests_per_minute=args.rpm, retries=args.retries)
+        failed = 0
+        for result in write_results(results, out, args.format):
+            failed += result["status"] != "ok"
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,456 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from registry import _rss_bytes, registry
+
+PIPELINES = ["analyze_image", "chatbot_interface", "detect_objects_yolo", "process_image_with_prompt", "detect_deepfake"]
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+        self.usage_metadata = types.SimpleNamespace(prompt_token_count=0, cached_content_token_count=0)
+
+
+class FakeStreamResponse:
+    """
+    Streaming response that yields chunks at the configured token rate.
+    """
+
+    def __init__(self, model, on_complete=None):
+        self._model = model
+        self._on_complete = on_complete
+        self._iterator = self  # lets sessions._cancel_stream find a cancel() method
+        self._cancelled = False
+        self.text = ""
+
+    def __iter__(self):
+        time.sleep(self._model.latency)
+        for chunk in self._model.chunks():
+            if self._cancelled:
+                return
+            time.sleep(self._model.chunk_tokens / self._model.tokens_per_second)
+            self.text += chunk
+            yield FakeResponse(chunk)
+        if self._on_complete is not None:
+            self._on_complete(self.text)
+
+    def cancel(self):
+        self._cancelled = True
+
+
+class FakeChatSession:
+    def __init__(self, model, history=None):
+        self.model = model
+        self.history = list(history or [])
+
+    def send_message(self, prompt, stream=False):
+        if stream:
+            return FakeStreamResponse(self.model, lambda text: self._record(prompt, text))
+        response = self.model.generate_content(prompt)
+        self._record(prompt, response.text)
+        return response
+
+    def _record(self, prompt, answer):
+        for role, text in (("user", prompt if isinstance(prompt, str) else "[media]"), ("model", answer)):
+            self.history.append(types.SimpleNamespace(role=role, parts=[types.SimpleNamespace(text=text)]))
+
+
+class FakeGeminiModel:
+    """
+    Local stand-in for genai.GenerativeModel with a fixed time-to-first-token and token rate.
+
+    Args:
+        latency (float): Seconds before the first token.
+        tokens_per_second (float): Output token rate.
+        response_tokens (int): Tokens per response.
+    """
+
+    def __init__(self, latency=0.3, tokens_per_second=200.0, response_tokens=120, chunk_tokens=20):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+        self.chunk_tokens = chunk_tokens
+        self.model_name = "models/fake-gemini"
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def chunks(self):
+        words = ["finding"] * self.response_tokens
+        for start in range(0, len(words), self.chunk_tokens):
+            yield " ".join(words[start:start + self.chunk_tokens]) + " "
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        with self._lock:
+            self.calls += 1
+        if stream:
+            return FakeStreamResponse(self)
+        time.sleep(self.latency + self.response_tokens / self.tokens_per_second)
+        return FakeResponse("".join(self.chunks()))
+
+    def count_tokens(self, contents):
+        return types.SimpleNamespace(total_tokens=0)
+
+    def start_chat(self, history=None):
+        return FakeChatSession(self, history)
+
+
+class _FakeTensor:
+    def __init__(self, array):
+        self._array = array
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self._array
+
+
+class FakeYOLO:
+    """
+    Stand-in for an ultralytics YOLO model returning random boxes after a fixed per-image delay.
+    """
+
+    def __init__(self, seconds_per_image=0.02, boxes_per_image=8):
+        self.seconds_per_image = seconds_per_image
+        self.boxes_per_image = boxes_per_image
+        self.names = {0: "person", 1: "car", 2: "dog"}
+
+    def predict(self, sources, **kwargs):
+        from PIL import Image
+        rng = np.random.default_rng(0)
+        results = []
+        for source in sources:
+            image = np.asarray(Image.open(source).convert("RGB"))[..., ::-1]
+            h, w = image.shape[:2]
+            xy = rng.uniform(0, 0.7, (self.boxes_per_image, 2)) * [w, h]
+            wh = rng.uniform(0.05, 0.3, (self.boxes_per_image, 2)) * [w, h]
+            boxes = types.SimpleNamespace(
+                xyxy=_FakeTensor(np.hstack([xy, xy + wh]).astype(np.float32)),
+                conf=_FakeTensor(rng.uniform(0.3, 1.0, self.boxes_per_image).astype(np.float32)),
+                cls=_FakeTensor(rng.integers(0, 3, self.boxes_per_image).astype(np.float32)),
+            )
+            results.append(types.SimpleNamespace(boxes=boxes, names=self.names, orig_img=image))
+        time.sleep(self.seconds_per_image * len(sources))
+        return results
+
+
+def make_yolo():
+    """
+    A randomly initialised YOLOv8n (no weights download) when ultralytics is installed, else FakeYOLO.
+    """
+    try:
+        from ultralytics import YOLO
+        return YOLO("yolov8n.yaml")
+    except Exception:
+        return FakeYOLO()
+
+
+class FakeKerasModel:
+    """
+    NumPy stand-in for the deepfake Keras model: a random linear probe on mean frame colour.
+    """
+
+    def __init__(self, seconds_per_clip=0.05):
+        self.seconds_per_clip = seconds_per_clip
+        self.weights = np.random.default_rng(0).normal(size=3).astype(np.float32)
+
+    def predict(self, batch, verbose=0):
+        time.sleep(self.seconds_per_clip * len(batch))
+        features = batch.reshape(len(batch), -1, 3).mean(axis=1)
+        return (1 / (1 + np.exp(-features @ self.weights)))[:, None]
+
+
+def make_keras_model(num_frames=10, size=224):
+    """
+    A tiny random-weight Keras video classifier when TensorFlow is installed, else FakeKerasModel.
+    """
+    try:
+        import tensorflow as tf
+        return tf.keras.Sequential([
+            tf.keras.layers.Input((num_frames, size, size, 3)),
+            tf.keras.layers.Conv3D(4, 3, strides=(1, 4, 4), activation="relu"),
+            tf.keras.layers.GlobalAveragePooling3D(),
+            tf.keras.layers.Dense(1, activation="sigmoid"),
+        ])
+    except Exception:
+        return FakeKerasModel()
+
+
+def make_images(directory, count=8, size=(1280, 960)):
+    """
+    Write `count` synthetic JPEG photos (noise plus coloured rectangles) and return their paths.
+    """
+    from PIL import Image, ImageDraw
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(count):
+        array = rng.integers(0, 255, (size[1], size[0], 3), dtype=np.uint8)
+        image = Image.fromarray(array)
+        draw = ImageDraw.Draw(image)
+        for _ in range(5):
+            x, y = rng.integers(0, size[0] - 200), rng.integers(0, size[1] - 200)
+            draw.rectangle([x, y, x + 200, y + 150], fill=tuple(int(c) for c in rng.integers(0, 255, 3)))
+        path = os.path.join(directory, f"image_{i}.jpg")
+        image.save(path, quality=90)
+        paths.append(path)
+    return paths
+
+
+def make_video(directory, seconds=10, fps=25, size=(640, 360)):
+    """
+    Write a synthetic video with a moving square and periodic scene changes.
+    """
+    import cv2
+    path = os.path.join(directory, "video.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, size)
+    for i in range(seconds * fps):
+        frame = np.full((size[1], size[0], 3), (i // (2 * fps)) * 40 % 255, dtype=np.uint8)
+        x = (i * 7) % (size[0] - 60)
+        frame[100:160, x:x + 60] = (0, 0, 255)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+class PeakRSS:
+    """
+    Samples resident memory in a background thread and keeps the peak.
+    """
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.start = _rss_bytes()
+        self.peak = self.start
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, _rss_bytes())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _rss_bytes())
+
+
+def run_load(fn, requests, concurrency, rss_before=None):
+    """
+    Call `fn(i)` for i in range(requests) with `concurrency` workers.
+
+    Memory is reported as the peak increase over `rss_before` (the level
+    when the run started by default). Freed memory is rarely returned to the
+    OS, so absolute RSS would carry earlier pipelines' peaks into later ones.
+    Returns:
+        dict: Latency percentiles (ms), throughput, error count and peak RSS increase (MB).
+    """
+    latencies = []
+    errors = 0
+
+    def timed(i):
+        started = time.perf_counter()
+        try:
+            fn(i)
+            ok = True
+        except Exception:
+            ok = False
+        return time.perf_counter() - started, ok
+
+    with PeakRSS() as rss:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for latency, ok in executor.map(timed, range(requests)):
+                latencies.append(latency)
+                errors += not ok
+        elapsed = time.perf_counter() - started
+
+    latencies_ms = np.array(latencies) * 1000
+    baseline = rss.start if rss_before is None else rss_before
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 2),
+        "throughput_rps": round(requests / elapsed, 2),
+        "peak_rss_increase_mb": round(max(rss.peak - baseline, 0) / 2 ** 20, 1),
+    }
+
+
+class PipelineError(Exception):
+    """
+    A pipeline reported a failure through its return value instead of raising.
+    """
+
+
+def _checked(fn, failed):
+    """
+    Wrap `fn(i)` so results for which `failed(result)` is true raise and count as errors.
+
+    The UI-facing functions catch their exceptions and return error strings,
+    which would otherwise be timed as fast successful requests.
+    """
+    def call(i):
+        result = fn(i)
+        if failed(result):
+            raise PipelineError(str(result)[:200])
+        return result
+    return call
+
+
+def build_pipelines(workdir, gemini, use_cache=False):
+    """
+    Install the stand-ins and return {name: fn(i)} for every pipeline whose module imports.
+    """
+    registry.override("gemini", gemini)
+    registry.override("yolo", make_yolo())
+    registry.override("deepfake", make_keras_model())
+
+    images = make_images(workdir)
+    pipelines = {}
+    skipped = {}
+
+    try:
+        import backend
+        for name in backend.router.routes:
+            registry.override(f"gemini_{name}", gemini)
+        if not use_cache:
+            from cache import LRUCache, ResponseCache
+            backend.analysis_cache = ResponseCache(memory=LRUCache(max_items=0))
+        pipelines["analyze_image"] = lambda i: backend.analyze_image_bytes(
+            open(images[i % len(images)], "rb").read(), f"Describe the findings in image {i}."
+        )
+        pipelines["chatbot_interface"] = _checked(lambda i: backend.chatbot_interface(
+            f"Question {i}: what should I do for a minor burn?", [], session_id=f"bench-{i % 32}"
+        ), lambda result: result[0].startswith("Error"))
+    except Exception as e:
+        skipped["analyze_image"] = skipped["chatbot_interface"] = str(e)
+
+    try:
+        import testbackend
+        pipelines["detect_objects_yolo"] = _checked(
+            lambda i: testbackend.detect_objects_yolo(images[i % len(images)]),
+            lambda result: result[0] is None,
+        )
+        pipelines["process_image_with_prompt"] = _checked(lambda i: testbackend.process_image_with_prompt(
+            images[i % len(images)], "What injuries are visible?", speak=False
+        ), lambda result: result[0] is None or result[1].startswith("Error"))
+    except Exception as e:
+        skipped["detect_objects_yolo"] = skipped["process_image_with_prompt"] = str(e)
+
+    try:
+        import deepfake_model
+        video = make_video(workdir)
+        pipelines["detect_deepfake"] = _checked(
+            lambda i: deepfake_model.detect_deepfake(video), lambda result: result.startswith("Error")
+        )
+    except Exception as e:
+        skipped["detect_deepfake"] = str(e)
+
+    return pipelines, skipped
+
+
+def compare(results, baseline, tolerance):
+    """
+    List p95 latency and throughput regressions beyond `tolerance` against a baseline run.
+    """
+    regressions = []
+    previous = {
+        (pipeline, run["concurrency"]): run
+        for pipeline, runs in baseline.get("pipelines", {}).items()
+        for run in runs
+    }
+    for pipeline, runs in results["pipelines"].items():
+        for run in runs:
+            old = previous.get((pipeline, run["concurrency"]))
+            if old is None:
+                continue
+            if run["p95_ms"] > old["p95_ms"] * (1 + tolerance):
+                regressions.append(f"{pipeline}@{run['concurrency']}: p95 {old['p95_ms']} -> {run['p95_ms']} ms")
+            if run["throughput_rps"] < old["throughput_rps"] * (1 - tolerance):
+                regressions.append(
+                    f"{pipeline}@{run['concurrency']}: throughput {old['throughput_rps']} -> {run['throughput_rps']} rps"
+                )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every pipeline offline against local stand-ins.")
+    parser.add_argument("--pipelines", nargs="+", choices=PIPELINES, default=PIPELINES)
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=64, help="Requests per pipeline and concurrency level")
+    parser.add_argument("--latency", type=float, default=0.3, help="Fake Gemini time to first token (s)")
+    parser.add_argument("--token-rate", type=float, default=200.0, help="Fake Gemini tokens per second")
+    parser.add_argument("--response-tokens", type=int, default=120)
+    parser.add_argument("--cache", action="store_true", help="Keep the analysis cache enabled")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="Previous results to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    args = parser.parse_args(argv)
+
+    gemini = FakeGeminiModel(args.latency, args.token_rate, args.response_tokens)
+    results = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "fake_gemini": {"latency": args.latency, "token_rate": args.token_rate,
+                        "response_tokens": args.response_tokens},
+        "pipelines": {},
+        "skipped": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="resqhub_bench_") as workdir:
+        pipelines, skipped = build_pipelines(workdir, gemini, use_cache=args.cache)
+        for name in args.pipelines:
+            if name not in pipelines:
+                results["skipped"][name] = skipped.get(name, "not available")
+                print(f"{name}: skipped ({results['skipped'][name]})", file=sys.stderr)
+                continue
+            # Memory is measured from here, so the pipeline's lazy loads count but earlier pipelines don't
+            rss_before = _rss_bytes()
+            # One untimed call so lazy loading doesn't count against the first level
+            try:
+                pipelines[name](0)
+            except Exception as e:
+                print(f"{name}: warm-up failed: {e}", file=sys.stderr)
+            results["pipelines"][name] = []
+            for concurrency in args.concurrency:
+                run = run_load(pipelines[name], args.requests, concurrency, rss_before)
+                results["pipelines"][name].append(run)
+                print(f"{name} x{concurrency}: p50 {run['p50_ms']} ms, p95 {run['p95_ms']} ms, "
+                      f"p99 {run['p99_ms']} ms, {run['throughput_rps']} req/s, "
+                      f"peak RSS +{run['peak_rss_increase_mb']} MB, {run['errors']} errors", file=sys.stderr)
+
+    results["model_loads"] = registry.stats()
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
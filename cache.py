@@ -0,0 +1,262 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+def normalize_prompt(prompt):
+    """
+    Normalize a prompt so trivially reworded repeats share a cache entry.
+
+    Case, surrounding whitespace, repeated whitespace and trailing
+    punctuation are ignored.
+    """
+    prompt = re.sub(r"\s+", " ", prompt or "").strip().lower()
+    return prompt.rstrip(" .?!")
+
+
+def make_key(data, prompt, config=None):
+    """
+    Build a content-addressed key from raw bytes, a prompt and a generation config.
+
+    Args:
+        data (bytes): Raw input bytes (e.g. the uploaded image file).
+        prompt (str): User prompt, normalized before hashing.
+        config (dict): Model name and generation settings that affect the output.
+    Returns:
+        str: Hex SHA-256 digest.
+    """
+    digest = hashlib.sha256()
+    digest.update(hashlib.sha256(data).digest())
+    digest.update(normalize_prompt(prompt).encode("utf-8"))
+    digest.update(json.dumps(config or {}, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _sizeof(value):
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    return 1
+
+
+class LRUCache:
+    """
+    Thread-safe in-memory LRU cache bounded by entry count and total size.
+
+    Args:
+        max_items (int): Maximum number of entries.
+        max_bytes (int): Maximum total size of str/bytes values.
+    """
+
+    def __init__(self, max_items=256, max_bytes=64 * 1024 * 1024):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        size = _sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._size -= _sizeof(self._data.pop(key))
+            self._data[key] = value
+            self._size += size
+            while len(self._data) > self.max_items or self._size > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self._size -= _sizeof(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._size = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    @property
+    def size(self):
+        return self._size
+
+
+class DiskCache:
+    """
+    SQLite-backed text cache with least-recently-used eviction by total size.
+
+    Args:
+        path (str): Database file, created if missing.
+        max_bytes (int): Total size of stored values before old entries are evicted.
+    """
+
+    def __init__(self, path, max_bytes=512 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return row[0]
+
+    def put(self, key, value):
+        size = _sizeof(value)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, size, time.time()),
+            )
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total > self.max_bytes:
+                rows = self._conn.execute("SELECT key, size FROM entries ORDER BY accessed").fetchall()
+                for old_key, old_size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    self._conn.execute("DELETE FROM entries WHERE key = ?", (old_key,))
+                    total -= old_size
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+
+
+class ResponseCache:
+    """
+    Two-tier model response cache: an in-memory LRU in front of an optional SQLite tier.
+
+    Hits on the disk tier are promoted to memory. Hit and miss counts are
+    kept per tier so the cache's effectiveness can be monitored.
+
+    Args:
+        memory (LRUCache): In-memory tier.
+        disk (DiskCache): Persistent tier, or None to keep everything in memory.
+    """
+
+    def __init__(self, memory=None, disk=None):
+        # Not `memory or LRUCache()`: an empty LRUCache is falsy, and the caller's limits would be dropped
+        self.memory = memory if memory is not None else LRUCache()
+        self.disk = disk
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not None:
+            with self._lock:
+                self.memory_hits += 1
+            return value
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.put(key, value)
+                with self._lock:
+                    self.disk_hits += 1
+                return value
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self.memory.put(key, value)
+        if self.disk is not None:
+            self.disk.put(key, value)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            hits = self.memory_hits + self.disk_hits
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_entries": len(self.memory),
+                "memory_bytes": self.memory.size,
+            }
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls for the same key into one.
+
+    The first caller for a key runs the function. Callers that arrive while
+    it is still running wait for the same result (or exception) instead of
+    making a duplicate upstream request. Nothing is kept once the call
+    finishes, so results that should be reused later go in a cache.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.calls = 0
+        self.collapsed = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        Return `fn(*args, **kwargs)`, sharing the call with identical in-flight requests for `key`.
+        """
+        with self._lock:
+            self.calls += 1
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            else:
+                self.collapsed += 1
+        if not leader:
+            return future.result()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._calls[key]
+        return future.result()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "collapsed": self.collapsed,
+                "in_flight": len(self._calls),
+            }
@@ -0,0 +1,232 @@
+import datetime
+import re
+
+# Rough characters-per-token ratio used when the API doesn't report counts
+CHARS_PER_TOKEN = 4
+
+ORDINALS = {
+    "first": 1, "second": 2, "third": 3, "fourth": 4, "fifth": 5,
+    "sixth": 6, "seventh": 7, "eighth": 8, "ninth": 9, "tenth": 10,
+}
+
+
+def estimate_tokens(contents):
+    """
+    Estimate the text tokens in a list of messages (media parts are not counted).
+    """
+    chars = 0
+    for message in contents:
+        for part in message["parts"]:
+            if isinstance(part, str):
+                chars += len(part)
+    return chars // CHARS_PER_TOKEN
+
+
+def _flatten(parts):
+    # A media part may be a list of parts, e.g. timestamped keyframes standing in for a video
+    flat = []
+    for part in parts:
+        if isinstance(part, list):
+            flat.extend(part)
+        else:
+            flat.append(part)
+    return flat
+
+
+def _text(message):
+    return "\n".join(part for part in message["parts"] if isinstance(part, str))
+
+
+def summarize_with_model(model):
+    """
+    Return a summarizer that asks `model` to condense earlier turns of the conversation.
+    """
+    def summarize(previous_summary, turns):
+        transcript = "\n\n".join(f"User: {question}\nModel: {answer}" for question, answer in turns)
+        prompt = (
+            "Condense this conversation into a short summary that keeps every fact, "
+            "finding and open question needed to continue it.\n\n"
+            f"Earlier summary:\n{previous_summary or '(none)'}\n\nConversation:\n{transcript}"
+        )
+        return model.generate_content(prompt).text
+    return summarize
+
+
+class _Exchange:
+    def __init__(self, number):
+        self.number = number
+        self.media = []
+        self.questions = []
+        self.answers = []
+
+    def aliases(self):
+        names = {f"video {self.number}", f"recording {self.number}", f"file {self.number}"}
+        for media in self.media:
+            if isinstance(media, list):
+                display_name = " ".join(part for part in media if isinstance(part, str))
+            else:
+                display_name = getattr(media, "display_name", "") or ""
+            # Recording names end in a time such as "9:20AM", which is how users refer to them
+            names.update(time.lower() for time in re.findall(r"\d{1,2}:\d{2}\s*[AP]M", display_name, re.I))
+        return names
+
+
+class ChatContext:
+    """
+    Manages what is re-sent to the model on each turn of a long multimodal chat.
+
+    The seeded history (media files with questions and answers about them)
+    is treated as a static prefix. When server-side context caching is
+    available, the prefix is cached once and only the new turns are sent.
+    Otherwise each media file is replaced by the text of the earlier answer
+    about it, and only the media the current question refers to ("video 3",
+    "the last recording", "the 10:30AM video") is attached in full.
+
+    New turns are kept verbatim until they exceed `token_budget`; older ones
+    are then folded into a running summary. Token usage per turn is recorded
+    in `turn_stats`.
+
+    Args:
+        model (GenerativeModel): Model used for answers.
+        seed_history (list): Chat history in `start_chat` format.
+        token_budget (int): Token budget for the verbatim recent turns.
+        keep_recent (int): Turns that are never summarized.
+        summarizer (callable): `summarizer(previous_summary, turns)`, defaults to asking the model.
+        cache_ttl (datetime.timedelta): Lifetime of the server-side prefix cache, None to disable.
+    """
+
+    def __init__(self, model, seed_history, token_budget=8000, keep_recent=2, summarizer=None,
+                 cache_ttl=datetime.timedelta(hours=1)):
+        self.model = model
+        self.token_budget = token_budget
+        self.keep_recent = keep_recent
+        self.summarizer = summarizer or summarize_with_model(model)
+        self.seed_history = seed_history
+        self.exchanges = self._group(seed_history)
+        self.turns = []
+        self.summary = ""
+        self.turn_stats = []
+        self.cached_model = self._create_cache(cache_ttl) if cache_ttl else None
+
+    @staticmethod
+    def _group(history):
+        exchanges = []
+        current = None
+        for message in history:
+            if message["role"] == "user":
+                if current is None or current.answers:
+                    current = _Exchange(len(exchanges) + 1)
+                    exchanges.append(current)
+                for part in message["parts"]:
+                    (current.questions if isinstance(part, str) else current.media).append(part)
+            elif current is not None:
+                current.answers.append(_text(message))
+        return exchanges
+
+    def _create_cache(self, ttl):
+        try:
+            from google.generativeai import caching
+            cached = caching.CachedContent.create(
+                model=self.model.model_name,
+                contents=[
+                    {"role": message["role"], "parts": _flatten(message["parts"])}
+                    for message in self.seed_history
+                ],
+                ttl=ttl,
+            )
+            return self.model.__class__.from_cached_content(
+                cached, generation_config=getattr(self.model, "_generation_config", None)
+            )
+        except Exception as e:
+            # Caching needs a supporting model and a large enough prefix; fall back to compaction
+            print("Context caching unavailable, compacting history instead:", e)
+            return None
+
+    def referenced_exchanges(self, question):
+        """
+        Return the seeded exchanges whose media the question refers to.
+        """
+        question = question.lower()
+        numbers = set()
+        for word, number in ORDINALS.items():
+            if re.search(rf"\b{word}\b\s+(video|recording|file|clip)", question):
+                numbers.add(number)
+        if re.search(r"\b(last|latest)\s+(video|recording|file|clip)", question) and self.exchanges:
+            numbers.add(len(self.exchanges))
+        return [
+            exchange for exchange in self.exchanges
+            if exchange.number in numbers or any(alias in question for alias in exchange.aliases())
+        ]
+
+    def _compact_prefix(self, pinned):
+        contents = []
+        for exchange in self.exchanges:
+            if not exchange.media:
+                parts = exchange.questions
+            elif exchange in pinned:
+                parts = _flatten(exchange.media) + exchange.questions
+            else:
+                parts = [f"[Video {exchange.number} is not attached. Earlier description follows.]"]
+                parts += exchange.questions
+            contents.append({"role": "user", "parts": parts})
+            if exchange.answers:
+                contents.append({"role": "model", "parts": ["\n".join(exchange.answers)]})
+        return contents
+
+    def _compact_turns(self):
+        # Fold the oldest verbatim turns into the summary once they exceed the budget
+        while len(self.turns) > self.keep_recent:
+            recent = [
+                {"role": role, "parts": [text]}
+                for question, answer in self.turns
+                for role, text in (("user", question), ("model", answer))
+            ]
+            if estimate_tokens(recent) <= self.token_budget:
+                break
+            fold = len(self.turns) - self.keep_recent
+            try:
+                self.summary = self.summarizer(self.summary, self.turns[:fold])
+            except Exception as e:
+                print("Error summarizing chat history, dropping oldest turns:", e)
+            self.turns = self.turns[fold:]
+
+    def build_contents(self, question):
+        """
+        Return the contents to send for `question` and the model to send them to.
+        """
+        if self.cached_model is not None:
+            model, contents = self.cached_model, []
+        else:
+            model, contents = self.model, self._compact_prefix(self.referenced_exchanges(question))
+        if self.summary:
+            contents.append({"role": "user", "parts": [f"Summary of the conversation so far:\n{self.summary}"]})
+            contents.append({"role": "model", "parts": ["Understood."]})
+        for previous_question, answer in self.turns:
+            contents.append({"role": "user", "parts": [previous_question]})
+            contents.append({"role": "model", "parts": [answer]})
+        contents.append({"role": "user", "parts": [question]})
+        return model, contents
+
+    def send_message(self, question):
+        """
+        Ask a question with the compacted context and record the turn.
+        """
+        model, contents = self.build_contents(question)
+        response = model.generate_content(contents)
+        answer = response.text
+        usage = getattr(response, "usage_metadata", None)
+        stats = {
+            "turn": len(self.turn_stats) + 1,
+            "media_attached": sum(
+                1 for message in contents for part in message["parts"] if not isinstance(part, str)
+            ),
+            "estimated_text_tokens": estimate_tokens(contents),
+            "prompt_tokens": getattr(usage, "prompt_token_count", None),
+            "cached_tokens": getattr(usage, "cached_content_token_count", None),
+        }
+        self.turn_stats.append(stats)
+        print(f"Turn {stats['turn']}: {stats['prompt_tokens']} prompt tokens "
+              f"({stats['cached_tokens'] or 0} cached, {stats['media_attached']} media attached)")
+        self.turns.append((question, answer))
+        self._compact_turns()
+        return response
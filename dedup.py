@@ -0,0 +1,186 @@
+import io
+import threading
+from collections import deque
+
+import numpy as np
+from PIL import Image, ImageOps
+
+HASH_BITS = 64
+
+
+def _dct_matrix(n):
+    # Orthonormal DCT-II basis, so a 2D DCT is two matrix products
+    k = np.arange(n)[:, None]
+    matrix = np.cos(np.pi * (2 * np.arange(n)[None, :] + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+
+_DCT_32 = _dct_matrix(32)
+
+
+def _bits_to_int(bits):
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+
+
+def _grayscale(image):
+    # JPEG decoders can scale down while decoding, which is most of the cost for large uploads.
+    # That only works before the pixels are loaded, and exif_transpose loads them.
+    image.draft("L", (128, 128))
+    return ImageOps.exif_transpose(image).convert("L")
+
+
+def _pixels(gray, size):
+    return np.asarray(gray.resize(size, Image.BILINEAR), dtype=np.float32)
+
+
+def _phash(gray):
+    low = (_DCT_32 @ _pixels(gray, (32, 32)) @ _DCT_32.T)[:8, :8]
+    # The DC term only encodes overall brightness and would dominate the median
+    median = np.median(low.ravel()[1:])
+    return _bits_to_int(low > median)
+
+
+def _dhash(gray):
+    pixels = _pixels(gray, (9, 8))
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def phash(image):
+    """
+    64-bit DCT perceptual hash: the sign of the lowest 8x8 frequencies against their median.
+    Survives recompression, resizing and small colour changes.
+    """
+    return _phash(_grayscale(image))
+
+
+def dhash(image):
+    """
+    64-bit difference hash: whether each pixel is brighter than its right neighbour on a 9x8 thumbnail.
+    """
+    return _dhash(_grayscale(image))
+
+
+def image_hashes(image_bytes):
+    """
+    Return the (phash, dhash) pair of encoded image bytes, from a single reduced decode.
+    """
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        gray = _grayscale(image)
+    return _phash(gray), _dhash(gray)
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over 64-bit hashes, for Hamming-distance range queries.
+
+    Each child edge is labelled with its distance to the parent, so by the
+    triangle inequality a query only descends into children whose label is
+    within `max_distance` of the query's distance to the node.
+    """
+
+    def __init__(self):
+        self._root = None  # [hash, values, {distance: child}]
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, key, value):
+        self._size += 1
+        if self._root is None:
+            self._root = [key, [value], {}]
+            return
+        node = self._root
+        while True:
+            distance = hamming(key, node[0])
+            if distance == 0:
+                node[1].append(value)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [key, [value], {}]
+                return
+            node = child
+
+    def search(self, key, max_distance):
+        """
+        Return (distance, hash, value) for every entry within `max_distance`, closest first.
+        """
+        matches = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(key, node[0])
+            if distance <= max_distance:
+                matches.extend((distance, node[0], value) for value in node[1])
+            for edge, child in node[2].items():
+                if distance - max_distance <= edge <= distance + max_distance:
+                    stack.append(child)
+        matches.sort(key=lambda match: match[0])
+        return matches
+
+
+class NearDuplicateIndex:
+    """
+    Index of analysed images by perceptual hash, to find earlier analyses of near-identical uploads.
+
+    Candidates come from a BK-tree over pHashes and must also be within
+    the distance on their dHash, which cuts false matches between images
+    that only share a coarse layout. Entries are scoped by a caller-supplied
+    key (e.g. normalized prompt and model config) so an analysis is only
+    reused for the same question.
+
+    Args:
+        similarity (float): Minimum fraction of matching hash bits (0-1) to count as a duplicate.
+        max_items (int): Entries kept; the oldest are dropped beyond this.
+    """
+
+    def __init__(self, similarity=0.98, max_items=10000):
+        self.max_distance = int((1.0 - similarity) * HASH_BITS)
+        self.max_items = max_items
+        self._lock = threading.Lock()
+        self._trees = {}
+        self._entries = deque()  # (scope, phash, dhash, value) in insertion order
+        self.lookups = 0
+        self.matches = 0
+
+    def _rebuild(self):
+        self._trees = {}
+        for scope, p_hash, d_hash, value in self._entries:
+            self._trees.setdefault(scope, BKTree()).add(p_hash, (d_hash, value))
+
+    def add(self, scope, hashes, value):
+        p_hash, d_hash = hashes
+        with self._lock:
+            self._entries.append((scope, p_hash, d_hash, value))
+            self._trees.setdefault(scope, BKTree()).add(p_hash, (d_hash, value))
+            if len(self._entries) > self.max_items:
+                # BK-trees can't delete, so drop the oldest quarter in one go and rebuild
+                for _ in range(max(1, self.max_items // 4)):
+                    self._entries.popleft()
+                self._rebuild()
+
+    def find(self, scope, hashes):
+        """
+        Return (value, similarity) of the closest match within the threshold, or None.
+        """
+        p_hash, d_hash = hashes
+        with self._lock:
+            self.lookups += 1
+            tree = self._trees.get(scope)
+            if tree is None:
+                return None
+            for distance, _, (match_dhash, value) in tree.search(p_hash, self.max_distance):
+                if hamming(d_hash, match_dhash) <= self.max_distance:
+                    self.matches += 1
+                    return value, 1.0 - distance / HASH_BITS
+        return None
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "lookups": self.lookups, "matches": self.matches}
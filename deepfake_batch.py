@@ -0,0 +1,218 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+import numpy as np
+
+from deepfake_frames import FRAME_SIZE, MAX_VIDEO_SECONDS, count_frames, read_frames
+
+VIDEO_EXTENSIONS = {".mp4", ".mov", ".avi", ".mkv", ".webm", ".m4v", ".x-matroska"}
+
+
+def extract_windows(video_path, num_frames=10, window_sec=5.0, stride_sec=None, max_duration=MAX_VIDEO_SECONDS):
+    """
+    Decode a video once and cut it into sliding clips of `num_frames` frames each.
+
+    Each window covers `window_sec` seconds and windows start every
+    `stride_sec` seconds (non-overlapping by default). If the strides leave
+    a tail uncovered, one more window ending at the last frame scores it.
+    Frames for all windows
+    come from a single forward decode pass and stay uint8 so they are cheap to
+    send back from a worker process.
+    Args:
+        video_path (str): Path to the video.
+        num_frames (int): Frames sampled per window.
+        window_sec (float): Window length in seconds.
+        stride_sec (float): Distance between window starts, defaults to `window_sec`.
+        max_duration (float): Only the first `max_duration` seconds are scored.
+    Returns:
+        Tuple: uint8 array (windows, num_frames, height, width, 3) and window start times in seconds.
+    """
+    stride_sec = stride_sec or window_sec
+    cap = cv2.VideoCapture(video_path)
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if total_frames <= 0:
+            # Not reported by some webm and streamed files
+            total_frames = count_frames(video_path, int(max_duration * fps) if max_duration else None)
+        if max_duration:
+            total_frames = min(total_frames, int(max_duration * fps))
+        window_frames = max(1, min(int(window_sec * fps), total_frames))
+        stride_frames = max(1, int(stride_sec * fps))
+        starts = np.arange(0, max(total_frames - window_frames, 0) + 1, stride_frames)
+        if len(starts) and starts[-1] + window_frames < total_frames:
+            starts = np.append(starts, total_frames - window_frames)
+        if total_frames <= 0 or len(starts) == 0:
+            return np.empty((0, num_frames, FRAME_SIZE[1], FRAME_SIZE[0], 3), dtype=np.uint8), []
+
+        # (windows, num_frames) frame indices, all decoded in one pass
+        window_indices = starts[:, None] + np.linspace(0, window_frames - 1, num_frames, dtype=int)[None, :]
+        frames, read_indices = read_frames(cap, window_indices.ravel())
+    finally:
+        cap.release()
+
+    # Keep only the windows whose frames were all decoded
+    complete = np.isin(window_indices, read_indices).all(axis=1)
+    positions = np.searchsorted(read_indices, window_indices[complete])
+    return frames[positions], (starts[complete] / fps).round(2).tolist()
+
+
+def _predict_windows(model, windows, batch_size):
+    """
+    Score stacked uint8 windows in batches, returning one score per window.
+    """
+    scores = []
+    for start in range(0, len(windows), batch_size):
+        batch = windows[start:start + batch_size].astype(np.float32)
+        batch *= 1.0 / 255.0
+        prediction = np.asarray(model.predict(batch, verbose=0))
+        scores.append(prediction.reshape(len(batch), -1).mean(axis=1))
+    return np.concatenate(scores) if scores else np.empty(0, dtype=np.float32)
+
+
+def list_videos(sources):
+    """
+    Expand files and directories into a sorted list of video paths.
+    """
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            for root, _, files in os.walk(source):
+                paths.extend(
+                    os.path.join(root, name) for name in files
+                    if os.path.splitext(name)[1].lower() in VIDEO_EXTENSIONS
+                )
+        else:
+            paths.append(source)
+    return sorted(paths)
+
+
+def score_videos(video_paths, num_frames=10, window_sec=5.0, stride_sec=None, batch_size=8,
+                 max_workers=None, threshold=0.5, on_result=None):
+    """
+    Score many videos with sliding windows, decoding in a process pool while the model runs.
+
+    Videos are decoded in worker processes. The main process stacks the
+    windows of whichever videos have finished decoding into full batches and
+    scores them while the remaining videos are still being decoded.
+    Args:
+        video_paths (list): Videos to score.
+        num_frames (int): Frames per window, must match the model input.
+        window_sec (float): Window length in seconds.
+        stride_sec (float): Distance between window starts.
+        batch_size (int): Windows per model.predict call.
+        max_workers (int): Decoding processes.
+        threshold (float): Aggregate score above which a video is flagged.
+        on_result (callable): Called with each video's result as soon as it is scored.
+    Returns:
+        dict: Per-video results under "videos" plus "seconds" and "videos_per_minute".
+    """
+    started = time.perf_counter()
+    from deepfake_model import get_model  # Only the parent process loads the model
+
+    model = get_model()
+    results = []
+    waiting = []  # (video state, uint8 windows not scored yet)
+
+    def finish(state, result):
+        results.append(result)
+        if on_result is not None:
+            on_result(result)
+
+    def aggregate(state):
+        scores = np.asarray(state["scores"], dtype=np.float32)
+        score = float(scores.mean())
+        return {
+            "video": state["video"],
+            "label": "Deepfake Detected" if score > threshold else "Real Video",
+            "score": round(score, 4),
+            "max_window_score": round(float(scores.max()), 4),
+            "windows": [
+                {"start_sec": start, "score": round(float(window_score), 4)}
+                for start, window_score in zip(state["starts"], scores)
+            ],
+        }
+
+    def score_waiting(final=False):
+        # Windows from different videos share batches; a partial batch waits for more videos
+        count = sum(len(windows) for _, windows in waiting)
+        usable = count if final else count - count % batch_size
+        if usable == 0:
+            return
+        stacked = np.concatenate([windows for _, windows in waiting])
+        owners = np.concatenate([np.full(len(windows), i) for i, (_, windows) in enumerate(waiting)])
+        scores = _predict_windows(model, stacked[:usable], batch_size)
+        remaining = []
+        for i, (state, _) in enumerate(waiting):
+            state["scores"].extend(scores[owners[:usable] == i].tolist())
+            rest = stacked[usable:][owners[usable:] == i]
+            if len(rest):
+                remaining.append((state, rest))
+            else:
+                finish(state, aggregate(state))
+        waiting[:] = remaining
+
+    # Spawned workers don't inherit TensorFlow's threads and locks from this process
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as pool:
+        futures = {
+            pool.submit(extract_windows, path, num_frames, window_sec, stride_sec): path
+            for path in video_paths
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                windows, window_starts = future.result()
+                if len(windows) == 0:
+                    raise ValueError("No valid frames extracted from video.")
+            except Exception as e:
+                finish(None, {"video": path, "label": "Error", "error": str(e)})
+                continue
+            waiting.append(({"video": path, "starts": window_starts, "scores": []}, windows))
+            try:
+                score_waiting()
+            except Exception as e:
+                for state, _ in waiting:
+                    finish(state, {"video": state["video"], "label": "Error", "error": str(e)})
+                waiting.clear()
+        try:
+            score_waiting(final=True)
+        except Exception as e:
+            for state, _ in waiting:
+                finish(state, {"video": state["video"], "label": "Error", "error": str(e)})
+
+    seconds = time.perf_counter() - started
+    return {
+        "videos": results,
+        "seconds": round(seconds, 3),
+        "videos_per_minute": round(len(results) / seconds * 60, 2) if seconds > 0 else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Screen videos for deepfakes with sliding-window scoring.")
+    parser.add_argument("sources", nargs="+", help="Video files or directories")
+    parser.add_argument("--window", type=float, default=5.0, help="Window length in seconds")
+    parser.add_argument("--stride", type=float, default=None, help="Seconds between window starts")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=None, help="Decoding processes")
+    parser.add_argument("--threshold", type=float, default=0.5)
+    args = parser.parse_args(argv)
+
+    summary = score_videos(
+        list_videos(args.sources), window_sec=args.window, stride_sec=args.stride,
+        batch_size=args.batch_size, max_workers=args.workers, threshold=args.threshold,
+        on_result=lambda result: print(json.dumps(result), flush=True),
+    )
+    print(f"Scored {len(summary['videos'])} videos in {summary['seconds']}s "
+          f"({summary['videos_per_minute']} videos/minute)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
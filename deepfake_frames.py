@@ -0,0 +1,102 @@
+import os
+
+import cv2
+import numpy as np
+
+from metrics import span
+
+# Load the trained deepfake detection model
+MODEL_PATH = "models/final_model6.h5"  # Update with your actual model path
+
+FRAME_SIZE = (224, 224)  # Adjust based on model input size
+
+# Longest stretch of video decoded per request, so multi-minute uploads can't stall a worker
+MAX_VIDEO_SECONDS = float(os.getenv("MAX_VIDEO_SECONDS", "120"))
+
+# Function to decode the frames at the given indices in a single forward pass
+def read_frames(cap, frame_indices, start_frame=0, size=FRAME_SIZE):
+    """
+    Decode frames sequentially from `start_frame`, keeping only the requested ones.
+
+    Frames in between are skipped with `grab()`, which avoids the keyframe
+    re-decode a seek costs on long-GOP video, and only the kept frames are
+    retrieved and resized straight into a preallocated uint8 buffer.
+    Args:
+        cap (cv2.VideoCapture): Capture positioned at `start_frame`.
+        frame_indices (array-like): Frame indices to keep; repeated indices are read once.
+        start_frame (int): Current position of `cap`.
+        size (tuple): Output (width, height).
+    Returns:
+        Tuple: uint8 array of shape (n, height, width, 3) and the indices actually read, sorted ascending.
+    """
+    frame_indices = np.unique(np.asarray(frame_indices, dtype=np.int64))
+    frames = np.empty((len(frame_indices), size[1], size[0], 3), dtype=np.uint8)
+    position = start_frame
+    count = 0
+    for target in frame_indices:
+        while position < target and cap.grab():
+            position += 1
+        if position != target or not cap.grab():
+            break
+        position += 1
+        ret, frame = cap.retrieve()
+        if not ret:
+            break
+        cv2.resize(frame, size, dst=frames[count])
+        count += 1
+    return frames[:count], frame_indices[:count]
+
+# Function to count frames by decoding, for containers that don't report a frame count
+def count_frames(video_path, limit=None):
+    cap = cv2.VideoCapture(video_path)
+    try:
+        count = 0
+        while (limit is None or count < limit) and cap.grab():
+            count += 1
+        return count
+    finally:
+        cap.release()
+
+# Function to extract frames from the video
+@span("extract_frames")
+def extract_frames(video_path, num_frames=10, start_sec=0.0, max_duration=MAX_VIDEO_SECONDS):
+    """
+    Sample `num_frames` evenly spaced frames, always exactly that many if any frame decodes.
+
+    Clips shorter than `num_frames` repeat frames, as the model takes a
+    fixed-length input. Frames that fail to decode are filled with the
+    nearest earlier one.
+    """
+    cap = cv2.VideoCapture(video_path)
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if total_frames <= 0:
+            # Unknown for some webm and streamed files, count by decoding instead
+            limit = int((start_sec + max_duration) * fps) if max_duration else None
+            total_frames = count_frames(video_path, limit)
+        start_frame = min(int(start_sec * fps), max(total_frames - 1, 0))
+        end_frame = total_frames - 1
+        if max_duration:
+            end_frame = min(end_frame, start_frame + int(max_duration * fps) - 1)
+        if end_frame < start_frame:
+            return np.empty((0, FRAME_SIZE[1], FRAME_SIZE[0], 3), dtype=np.float32)
+
+        if start_frame > 0:
+            # One seek to the start of the range, then decode forward only
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        frame_indices = np.linspace(start_frame, end_frame, num_frames, dtype=int)
+        frames, read_indices = read_frames(cap, frame_indices, start_frame)
+    finally:
+        cap.release()
+    if len(frames) == 0:
+        return np.empty((0, FRAME_SIZE[1], FRAME_SIZE[0], 3), dtype=np.float32)
+
+    # Back to one frame per sampled index, repeats included
+    positions = np.clip(np.searchsorted(read_indices, frame_indices, side="right") - 1, 0, None)
+    frames = frames[positions]
+
+    # Normalize once for the whole clip, in float32 rather than float64
+    frames = frames.astype(np.float32)
+    frames *= 1.0 / 255.0
+    return frames
@@ -0,0 +1,54 @@
+import os
+
+import numpy as np
+
+from registry import registry
+from metrics import span
+from deepfake_frames import MODEL_PATH, extract_frames
+
+# "keras" serves the original model; "float16", "dynamic" or "int8" serve a quantized TFLite export of it,
+# converted on first load if needed (see deepfake_tflite.py for the accuracy/latency comparison)
+MODEL_MODE = os.getenv("DEEPFAKE_MODEL_MODE", "keras")
+
+# Function to load the deepfake model in the configured mode
+def _load_model():
+    if MODEL_MODE != "keras":
+        from deepfake_tflite import load_tflite_model
+        threads = os.getenv("DEEPFAKE_TFLITE_THREADS")
+        calibration = os.getenv("DEEPFAKE_CALIBRATION_DIR")
+        calibration_videos = None
+        if calibration:
+            from deepfake_batch import list_videos
+            calibration_videos = list_videos([calibration])
+        return load_tflite_model(
+            MODEL_MODE,
+            path=os.getenv("DEEPFAKE_TFLITE_PATH"),
+            num_threads=int(threads) if threads else None,
+            calibration_videos=calibration_videos,
+        )
+    # TensorFlow is only imported when the model is first needed
+    import tensorflow as tf
+    return tf.keras.models.load_model(MODEL_PATH)
+
+registry.register("deepfake", _load_model)
+
+# Function to get the shared deepfake model, loading it on first use
+def get_model():
+    return registry.get("deepfake")
+
+# Deepfake detection function
+def detect_deepfake(video_path):
+    frames = extract_frames(video_path)
+    
+    if len(frames) == 0:
+        return "Error: No valid frames extracted from video."
+    
+    frames = np.expand_dims(frames, axis=0)  # Add batch dimension
+    with span("deepfake_predict"):
+        prediction = get_model().predict(frames)  # Get predictions
+    
+    # Assuming the model outputs a probability (adjust threshold as needed)
+    deepfake_score = np.mean(prediction)
+    result = "Deepfake Detected" if deepfake_score > 0.5 else "Real Video"
+    
+    return result
@@ -0,0 +1,286 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+from deepfake_frames import MODEL_PATH, extract_frames
+
+# "dynamic" quantizes weights only and needs no calibration data,
+# "int8" also quantizes activations using calibration videos
+MODES = ("float16", "dynamic", "int8")
+
+
+def default_tflite_path(mode):
+    return f"{os.path.splitext(MODEL_PATH)[0]}_{mode}.tflite"
+
+
+def calibration_windows(video_paths, num_frames=10, max_samples=100):
+    """
+    Yield float32 model inputs from calibration videos, a few windows spread over each video.
+    """
+    from deepfake_batch import extract_windows
+
+    per_video = max(1, max_samples // max(len(video_paths), 1))
+    produced = 0
+    for path in video_paths:
+        windows, _ = extract_windows(path, num_frames)
+        for i in np.unique(np.linspace(0, len(windows) - 1, min(per_video, len(windows)), dtype=int)):
+            yield windows[i][None].astype(np.float32) / 255.0
+            produced += 1
+            if produced >= max_samples:
+                return
+
+
+def export_tflite(model, output_path, mode="float16", calibration_videos=None, max_samples=100):
+    """
+    Convert a Keras model to a quantized TFLite flatbuffer.
+
+    Args:
+        model: Keras model, or a path to one.
+        output_path (str): Where to write the .tflite file.
+        mode (str): One of MODES.
+        calibration_videos (list): Videos used to calibrate activation ranges, required for "int8".
+        max_samples (int): Calibration windows used.
+    Returns:
+        str: `output_path`.
+    """
+    import tensorflow as tf
+
+    if mode not in MODES:
+        raise ValueError(f"Unknown quantization mode '{mode}', expected one of {MODES}.")
+    if isinstance(model, str):
+        model = tf.keras.models.load_model(model)
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if mode == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    elif mode == "int8":
+        if not calibration_videos:
+            raise ValueError("int8 export needs calibration videos to measure activation ranges.")
+        num_frames = model.input_shape[1]
+        converter.representative_dataset = lambda: (
+            [window] for window in calibration_windows(calibration_videos, num_frames, max_samples)
+        )
+        # Ops without an int8 kernel stay in float instead of failing the conversion
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8, tf.lite.OpsSet.TFLITE_BUILTINS]
+
+    started = time.perf_counter()
+    flatbuffer = converter.convert()
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(output_path, "wb") as f:
+        f.write(flatbuffer)
+    print(f"Exported {mode} TFLite model to {output_path} ({len(flatbuffer) / 2 ** 20:.1f} MB) "
+          f"in {time.perf_counter() - started:.1f}s")
+    return output_path
+
+
+class TFLiteModel:
+    """
+    Serve a TFLite model through the `predict` call the Keras model is used with.
+
+    Uses the standalone tflite_runtime interpreter when installed, which
+    avoids loading TensorFlow at all, and TensorFlow's bundled one otherwise.
+    The interpreter is not thread-safe, so calls are serialized; use
+    `num_threads` for parallelism within a call.
+
+    Args:
+        path (str): .tflite file.
+        num_threads (int): Interpreter threads, None for the runtime default.
+    """
+
+    def __init__(self, path, num_threads=None):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+        self.path = path
+        self.num_threads = num_threads
+        self._interpreter = Interpreter(model_path=path, num_threads=num_threads)
+        self._interpreter.allocate_tensors()
+        self._input = self._interpreter.get_input_details()[0]
+        self._output = self._interpreter.get_output_details()[0]
+        self._lock = threading.Lock()
+
+    def predict(self, x, verbose=0, **kwargs):
+        x = np.asarray(x, dtype=np.float32)
+        with self._lock:
+            if tuple(self._input["shape"]) != x.shape:
+                # Batch size changed, resize and re-plan the tensors
+                self._interpreter.resize_tensor_input(self._input["index"], x.shape)
+                self._interpreter.allocate_tensors()
+                self._input = self._interpreter.get_input_details()[0]
+                self._output = self._interpreter.get_output_details()[0]
+            scale, zero_point = self._input["quantization"]
+            if self._input["dtype"] != np.float32 and scale:
+                info = np.iinfo(self._input["dtype"])
+                x = np.clip(np.round(x / scale + zero_point), info.min, info.max)
+            self._interpreter.set_tensor(self._input["index"], x.astype(self._input["dtype"]))
+            self._interpreter.invoke()
+            output = self._interpreter.get_tensor(self._output["index"]).copy()
+        scale, zero_point = self._output["quantization"]
+        if output.dtype != np.float32 and scale:
+            output = (output.astype(np.float32) - zero_point) * scale
+        return output
+
+
+def _export_options(mode, calibration_videos):
+    options = {"source": os.path.abspath(MODEL_PATH), "mode": mode}
+    if mode == "int8" and calibration_videos:
+        options["calibration"] = sorted(os.path.abspath(path) for path in calibration_videos)
+    return options
+
+
+def export_model(path, mode, calibration_videos=None):
+    """
+    Export MODEL_PATH and record the options next to the artifact, so `load_tflite_model` can tell when it is stale.
+    """
+    export_tflite(MODEL_PATH, path, mode, calibration_videos=calibration_videos)
+    with open(path + ".json", "w") as f:
+        json.dump(_export_options(mode, calibration_videos), f, indent=2)
+    return path
+
+
+def _is_stale(path, options):
+    # Rebuilt when missing, older than the Keras model or exported with other options. An int8 artifact
+    # loaded without calibration videos is kept, whatever set it was calibrated on.
+    if not os.path.exists(path):
+        return True
+    if not os.path.exists(MODEL_PATH):
+        return False  # Deployed without the Keras model, nothing to rebuild from
+    if os.path.getmtime(path) < os.path.getmtime(MODEL_PATH):
+        return True
+    try:
+        with open(path + ".json") as f:
+            recorded = json.load(f)
+    except (OSError, ValueError):
+        return True
+    return any(recorded.get(name) != value for name, value in options.items())
+
+
+def load_tflite_model(mode, path=None, num_threads=None, calibration_videos=None):
+    """
+    Load the quantized deepfake model, exporting it from MODEL_PATH first if the artifact is missing or stale.
+    """
+    path = path or default_tflite_path(mode)
+    options = _export_options(mode, calibration_videos)
+    if _is_stale(path, options):
+        export_model(path, mode, calibration_videos)
+    return TFLiteModel(path, num_threads=num_threads)
+
+
+def _timed_scores(model, windows, repeats):
+    if repeats < 1:
+        raise ValueError("repeats must be at least 1.")
+    scores = []
+    latencies = []
+    for window in windows:
+        for _ in range(repeats):
+            started = time.perf_counter()
+            prediction = model.predict(window, verbose=0)
+            latencies.append(time.perf_counter() - started)
+        scores.append(float(np.mean(prediction)))
+    return np.asarray(scores), np.asarray(latencies) * 1000
+
+
+def compare_modes(video_paths, modes=MODES, num_threads=None, repeats=3, threshold=0.5, calibration_videos=None):
+    """
+    Score the same videos with the Keras model and each quantized mode.
+
+    int8 needs `calibration_videos`, and they should not be the evaluated
+    videos: calibrating on the test set makes its accuracy look better than
+    it is on new videos.
+    Returns:
+        dict: Per mode, the file size, latency percentiles, speedup over Keras,
+        score error against Keras and how often the Real/Deepfake label agrees.
+    """
+    if "int8" in modes:
+        if not calibration_videos:
+            raise ValueError("int8 needs calibration videos separate from the evaluated ones (--calibration).")
+        overlap = set(map(os.path.abspath, calibration_videos)) & set(map(os.path.abspath, video_paths))
+        if overlap:
+            print(f"WARNING: {len(overlap)} calibration videos are also evaluated, "
+                  f"int8 accuracy will be overstated.", file=sys.stderr)
+
+    import tensorflow as tf
+
+    windows = [frames[None] for frames in (extract_frames(path) for path in video_paths) if len(frames)]
+    if not windows:
+        raise ValueError("No frames could be extracted from the given videos.")
+
+    keras_model = tf.keras.models.load_model(MODEL_PATH)
+    keras_model.predict(windows[0], verbose=0)  # Build the predict function outside the timings
+    reference, keras_ms = _timed_scores(keras_model, windows, repeats)
+    rows = [{
+        "mode": "keras",
+        "size_mb": round(os.path.getsize(MODEL_PATH) / 2 ** 20, 2),
+        "p50_ms": round(float(np.percentile(keras_ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(keras_ms, 95)), 2),
+        "speedup": 1.0,
+        "mean_abs_error": 0.0,
+        "max_abs_error": 0.0,
+        "label_agreement": 1.0,
+    }]
+    for mode in modes:
+        model = load_tflite_model(mode, num_threads=num_threads, calibration_videos=calibration_videos)
+        scores, latency_ms = _timed_scores(model, windows, repeats)
+        errors = np.abs(scores - reference)
+        rows.append({
+            "mode": mode,
+            "size_mb": round(os.path.getsize(model.path) / 2 ** 20, 2),
+            "p50_ms": round(float(np.percentile(latency_ms, 50)), 2),
+            "p95_ms": round(float(np.percentile(latency_ms, 95)), 2),
+            "speedup": round(float(np.median(keras_ms) / np.median(latency_ms)), 2),
+            "mean_abs_error": round(float(errors.mean()), 4),
+            "max_abs_error": round(float(errors.max()), 4),
+            "label_agreement": round(float(np.mean((scores > threshold) == (reference > threshold))), 4),
+        })
+    return {"videos": len(windows), "threads": num_threads, "repeats": repeats, "modes": rows}
+
+
+def main(argv=None):
+    from deepfake_batch import list_videos
+
+    parser = argparse.ArgumentParser(description="Export and evaluate quantized TFLite versions of the deepfake model.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="Convert the Keras model to TFLite")
+    export.add_argument("--mode", choices=MODES, default="float16")
+    export.add_argument("--output", default=None, help="Defaults to the model path with a _<mode>.tflite suffix")
+    export.add_argument("--calibration", nargs="*", default=[], help="Videos or directories, required for int8")
+
+    compare = commands.add_parser("compare", help="Accuracy/latency report against the Keras model")
+    compare.add_argument("sources", nargs="+", help="Video files or directories")
+    compare.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    compare.add_argument("--threads", type=int, default=None, help="Interpreter threads")
+    compare.add_argument("--repeats", type=int, default=3, help="Timed runs per video")
+    compare.add_argument("--calibration", nargs="*", default=[],
+                         help="Videos or directories for int8 calibration, kept apart from the evaluated ones")
+    compare.add_argument("--output", default=None, help="Also write the report as JSON")
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        export_model(args.output or default_tflite_path(args.mode), args.mode, list_videos(args.calibration))
+        return
+
+    report = compare_modes(list_videos(args.sources), args.modes, num_threads=args.threads, repeats=args.repeats,
+                           calibration_videos=list_videos(args.calibration))
+    print(f"{report['videos']} videos, {report['threads'] or 'default'} threads")
+    print(f"{'mode':<8} {'MB':>7} {'p50 ms':>8} {'p95 ms':>8} {'speedup':>8} {'mean err':>9} {'max err':>8} {'agree':>6}")
+    for row in report["modes"]:
+        print(f"{row['mode']:<8} {row['size_mb']:>7} {row['p50_ms']:>8} {row['p95_ms']:>8} {row['speedup']:>8} "
+              f"{row['mean_abs_error']:>9} {row['max_abs_error']:>8} {row['label_agreement']:>6.1%}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
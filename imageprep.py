@@ -0,0 +1,104 @@
+import io
+import threading
+from PIL import Image, ImageOps
+
+# Image formats Gemini accepts as-is, mapped to their MIME type
+ACCEPTED_FORMATS = {
+    "JPEG": "image/jpeg",
+    "PNG": "image/png",
+    "WEBP": "image/webp",
+    "HEIC": "image/heic",
+    "HEIF": "image/heif",
+}
+
+EXIF_ORIENTATION = 0x0112
+
+_stats_lock = threading.Lock()
+_stats = {"requests": 0, "passthrough": 0, "reencoded": 0, "bytes_in": 0, "bytes_sent": 0, "bytes_saved": 0}
+
+
+class PreparedImage:
+    """
+    Image bytes ready to be sent to the model as an inline blob.
+
+    Attributes:
+        data (bytes): Bytes to send.
+        mime_type (str): MIME type of `data`.
+        original_bytes (int): Size of the upload.
+        passthrough (bool): True when the upload is sent unchanged.
+        bytes_saved (int): Bytes saved compared to sending the upload as base64 text.
+    """
+
+    def __init__(self, data, mime_type, original_bytes, passthrough):
+        self.data = data
+        self.mime_type = mime_type
+        self.original_bytes = original_bytes
+        self.passthrough = passthrough
+        self.bytes_saved = _base64_size(original_bytes) - len(data)
+
+    def as_part(self):
+        """
+        Return the image as a generate_content blob part.
+        """
+        return {"mime_type": self.mime_type, "data": self.data}
+
+
+def _base64_size(n):
+    return (n + 2) // 3 * 4
+
+
+def prepare_image(data, max_side=2048, jpeg_quality=90):
+    """
+    Prepare uploaded image bytes for a multimodal request with as little work as possible.
+
+    Uploads that are already in an accepted format, upright and no larger than
+    `max_side` are sent byte-for-byte without decoding. Otherwise the image is
+    rotated according to its EXIF orientation, downscaled to fit `max_side` and
+    re-encoded once, in its own format when accepted or as PNG otherwise.
+
+    Args:
+        data (bytes): Raw uploaded file.
+        max_side (int): Maximum width/height sent to the model.
+        jpeg_quality (int): Quality used when re-encoding JPEGs.
+    Returns:
+        PreparedImage: Bytes and MIME type to send.
+    """
+    # Opening only parses the header, pixels are not decoded yet
+    image = Image.open(io.BytesIO(data))
+    image_format = image.format
+    orientation = image.getexif().get(EXIF_ORIENTATION, 1)
+    oversized = max(image.size) > max_side
+
+    if image_format in ACCEPTED_FORMATS and orientation == 1 and not oversized:
+        prepared = PreparedImage(data, ACCEPTED_FORMATS[image_format], len(data), True)
+    else:
+        if oversized and image_format == "JPEG":
+            # Let the JPEG decoder skip detail that would be thrown away anyway
+            image.draft("RGB", (max_side, max_side))
+        image = ImageOps.exif_transpose(image)
+        if oversized:
+            image.thumbnail((max_side, max_side), Image.LANCZOS)
+
+        out_format = image_format if image_format in ACCEPTED_FORMATS else "PNG"
+        buffered = io.BytesIO()
+        if out_format == "JPEG":
+            image.convert("RGB").save(buffered, format="JPEG", quality=jpeg_quality)
+        else:
+            image.save(buffered, format=out_format)
+        prepared = PreparedImage(buffered.getvalue(), ACCEPTED_FORMATS[out_format], len(data), False)
+
+    with _stats_lock:
+        _stats["requests"] += 1
+        _stats["passthrough" if prepared.passthrough else "reencoded"] += 1
+        _stats["bytes_in"] += prepared.original_bytes
+        _stats["bytes_sent"] += len(prepared.data)
+        _stats["bytes_saved"] += prepared.bytes_saved
+    return prepared
+
+
+def upload_stats():
+    """
+    Return cumulative counters for prepared uploads.
+    """
+    with _stats_lock:
+        return dict(_stats)
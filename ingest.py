@@ -0,0 +1,202 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import google.generativeai as genai
+
+from jobs import register_task
+from manifest import UploadManifest
+
+
+def print_progress(path, status, detail=""):
+    """
+    Default progress callback, prints one line per file event.
+    """
+    print(f"[{status}] {path}" + (f": {detail}" if detail else ""), flush=True)
+
+
+def upload_to_gemini(path, mime_type=None):
+    """Uploads the given file to Gemini.
+
+    See https://ai.google.dev/gemini-api/docs/prompting_with_media
+    """
+    file = genai.upload_file(path, mime_type=mime_type)
+    print(f"Uploaded file '{file.display_name}' as: {file.uri}")
+    return file
+
+
+def _state(file):
+    return file.state.name if getattr(file, "state", None) is not None else "ACTIVE"
+
+
+def _reuse_upload(manifest, sha256, size, mime_type):
+    """
+    Return the remote file for already uploaded content if it is still usable, else None.
+    """
+    entry = manifest.lookup(sha256, size, mime_type)
+    if entry is None:
+        return None
+    try:
+        # Cheap state check before trusting the manifest
+        file = genai.get_file(entry["name"])
+    except Exception:
+        file = None
+    if file is None or _state(file) not in ("ACTIVE", "PROCESSING"):
+        manifest.forget(sha256, size, mime_type)
+        return None
+    return file
+
+
+def upload_files(paths, mime_type=None, max_workers=4, on_progress=print_progress, manifest=None):
+    """
+    Upload files to Gemini concurrently.
+
+    With a manifest, content that was already uploaded and is still live on
+    the server is reused instead of being uploaded again. A failed upload is
+    recorded in its result instead of aborting the batch.
+    Args:
+        paths (list): Local files to upload.
+        mime_type (str): MIME type shared by all files, or None to let the SDK guess.
+        max_workers (int): Concurrent uploads.
+        on_progress (callable): Called as `on_progress(path, status, detail)`.
+        manifest (UploadManifest): Record of previous uploads, or None to always upload.
+    Returns:
+        list: One dict per path, in input order, with keys "path", "file", "state",
+        "error" and "reused".
+    """
+    def upload(path):
+        try:
+            key = None
+            if manifest is not None:
+                key = manifest.fingerprint(path)
+                file = _reuse_upload(manifest, *key, mime_type)
+                if file is not None:
+                    on_progress(path, "reused", file.uri)
+                    return {"path": path, "file": file, "state": _state(file), "error": None, "reused": True}
+            on_progress(path, "uploading")
+            file = upload_to_gemini(path, mime_type=mime_type)
+            if key is not None:
+                manifest.record(*key, mime_type, file)
+        except Exception as e:
+            on_progress(path, "failed", str(e))
+            return {"path": path, "file": None, "state": "FAILED", "error": str(e), "reused": False}
+        on_progress(path, "uploaded", file.uri)
+        return {"path": path, "file": file, "state": _state(file), "error": None, "reused": False}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(upload, paths))
+
+
+def _poll_delay(attempt, base_delay, max_delay):
+    # Exponential backoff with jitter, so concurrent pollers don't line up
+    delay = min(max_delay, base_delay * (2 ** attempt))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def wait_for_files_active(results, timeout=1800, base_delay=2.0, max_delay=30.0, max_workers=8,
+                          on_progress=print_progress):
+    """
+    Wait until every uploaded file has finished processing.
+
+    All pending files are polled together in each round, with exponential
+    backoff and jitter between rounds, so the total wait is roughly that of
+    the slowest file rather than the sum of all of them. Files that fail or
+    time out are marked in their result; the others are still returned.
+    Args:
+        results (list): Results from `upload_files`, updated in place.
+        timeout (float): Seconds to wait before giving up on pending files.
+        base_delay (float): First delay between polling rounds.
+        max_delay (float): Longest delay between polling rounds.
+        max_workers (int): Concurrent `get_file` calls per round.
+        on_progress (callable): Called as `on_progress(path, status, detail)`.
+    Returns:
+        list: `results`.
+    """
+    deadline = time.monotonic() + timeout
+    attempt = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while True:
+            pending = [result for result in results if result["state"] == "PROCESSING"]
+            if not pending:
+                break
+            if time.monotonic() >= deadline:
+                for result in pending:
+                    result["state"] = "TIMEOUT"
+                    result["error"] = f"Still processing after {timeout}s"
+                    on_progress(result["path"], "timeout", result["error"])
+                break
+            time.sleep(min(_poll_delay(attempt, base_delay, max_delay), max(0.0, deadline - time.monotonic())))
+            attempt += 1
+
+            def poll(result):
+                try:
+                    return genai.get_file(result["file"].name), None
+                except Exception as e:
+                    return None, e
+
+            for result, (file, error) in zip(pending, executor.map(poll, pending)):
+                if error is not None:
+                    # Transient polling errors are retried in the next round
+                    on_progress(result["path"], "poll-error", str(error))
+                    continue
+                result["file"] = file
+                result["state"] = _state(file)
+                if result["state"] == "ACTIVE":
+                    on_progress(result["path"], "active")
+                elif result["state"] != "PROCESSING":
+                    result["error"] = f"File {file.name} failed to process"
+                    on_progress(result["path"], "failed", result["error"])
+    return results
+
+
+def ingest_files(paths, mime_type=None, max_workers=4, timeout=1800, on_progress=print_progress, manifest=None):
+    """
+    Upload files concurrently (reusing previous uploads found in `manifest`) and wait
+    until they can be used in prompts.
+
+    Returns:
+        list: One result per path, see `upload_files`. Usable files have state "ACTIVE".
+    """
+    results = upload_files(paths, mime_type=mime_type, max_workers=max_workers, on_progress=on_progress,
+                           manifest=manifest)
+    wait_for_files_active(results, timeout=timeout, on_progress=on_progress)
+    failed = [result for result in results if result["state"] != "ACTIVE"]
+    reused = sum(result["reused"] for result in results)
+    print(f"...{len(results) - len(failed)} of {len(results)} files ready ({reused} reused)")
+    return results
+
+
+def upload_job(paths, mime_type=None, max_workers=4, progress=None):
+    """
+    Background job: ingest files, reusing uploads recorded in the default manifest.
+
+    Submitted by gemini.py. Only processes that import this module register
+    the task, and they must have configured the Gemini API key.
+
+    Returns:
+        list: Per path, the file `name` (for `genai.get_file`), uri, state, error and reused flag.
+    """
+    finished = set()
+
+    def on_progress(path, status, detail=""):
+        print_progress(path, status, detail)
+        if status in ("active", "failed", "timeout", "reused") and progress is not None:
+            finished.add(path)
+            progress(len(finished) / max(len(paths), 1), f"{status}: {path}")
+
+    results = ingest_files(paths, mime_type=mime_type, max_workers=max_workers, on_progress=on_progress,
+                           manifest=UploadManifest())
+    return [
+        {
+            "path": result["path"],
+            "name": result["file"].name if result["file"] is not None else None,
+            "uri": result["file"].uri if result["file"] is not None else None,
+            "state": result["state"],
+            "error": result["error"],
+            "reused": result["reused"],
+        }
+        for result in results
+    ]
+
+
+register_task("gemini_upload", upload_job)
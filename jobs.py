@@ -0,0 +1,297 @@
+import itertools
+import json
+import os
+import queue
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+# Lower runs first; interactive jobs jump ahead of queued bulk work
+PRIORITIES = {"interactive": 0, "normal": 1, "bulk": 2}
+
+FINISHED = ("done", "failed", "cancelled")
+
+_tasks = {}
+
+
+def register_task(name, fn):
+    """
+    Make `fn` runnable as a background job under `name`.
+
+    The task is called as `fn(*args, progress=report)`, where
+    `report(fraction, message="")` updates the job's progress. Arguments and
+    the result must be JSON-serializable so jobs survive restarts.
+    """
+    _tasks[name] = fn
+
+
+class JobQueue:
+    """
+    Local background job queue persisted in SQLite.
+
+    Jobs run on a small pool of worker threads, separate from the threads
+    serving the UI, in priority order and then FIFO. Every state change is
+    written to SQLite. Jobs whose task isn't registered in this process stay
+    queued for one that registers it.
+
+    Several processes may share the database. A job is claimed atomically
+    by the worker that moves it from queued to running, so it runs once.
+    The owning process refreshes a heartbeat on its running jobs. Jobs whose
+    heartbeat stopped (their process died) are queued again. Each process
+    also picks up jobs queued by the others.
+
+    Args:
+        path (str): Database file, created if missing.
+        max_workers (int): Jobs running at once.
+        heartbeat_interval (float): Seconds between heartbeats and scans for new or orphaned jobs.
+        stale_after (float): Heartbeat age after which a running job counts as interrupted.
+    """
+
+    def __init__(self, path=os.path.join("cache", "jobs.sqlite"), max_workers=2, heartbeat_interval=10.0,
+                 stale_after=60.0):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        # Other processes may hold the write lock briefly, wait for it rather than failing
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, task TEXT NOT NULL, args TEXT NOT NULL, priority INTEGER NOT NULL,"
+            " status TEXT NOT NULL, progress REAL NOT NULL DEFAULT 0, message TEXT NOT NULL DEFAULT '',"
+            " result TEXT, error TEXT, created REAL NOT NULL, started REAL, finished REAL,"
+            " owner TEXT, heartbeat REAL)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column, kind in (("owner", "TEXT"), ("heartbeat", "REAL")):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+        self._conn.commit()
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._queue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._done = {}
+        self._known = set()  # job ids put on the local queue
+        self.max_workers = max_workers
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        self._workers = []
+
+    def start(self):
+        """
+        Re-queue interrupted jobs, pick up queued ones and start the worker and heartbeat threads.
+        """
+        self._scan()
+        for i in range(self.max_workers):
+            worker = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        heartbeat = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+        heartbeat.start()
+        self._workers.append(heartbeat)
+        return self
+
+    def _scan(self):
+        # Running jobs whose owner stopped beating died with their process
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'queued', started = NULL, owner = NULL, heartbeat = NULL"
+                " WHERE status = 'running' AND (heartbeat IS NULL OR heartbeat < ?)",
+                (now - self.stale_after,),
+            )
+            self._conn.commit()
+            rows = self._conn.execute(
+                "SELECT id, priority, task FROM jobs WHERE status = 'queued' ORDER BY created"
+            ).fetchall()
+        for job_id, priority, task in rows:
+            if task in _tasks:
+                self._enqueue(job_id, priority)
+
+    def _heartbeat(self):
+        while True:
+            time.sleep(self.heartbeat_interval)
+            try:
+                with self._lock:
+                    self._conn.execute(
+                        "UPDATE jobs SET heartbeat = ? WHERE owner = ? AND status = 'running'",
+                        (time.time(), self.owner),
+                    )
+                    self._conn.commit()
+                self._scan()
+            except sqlite3.Error as e:
+                print("Error updating job heartbeats:", e)
+
+    def _enqueue(self, job_id, priority):
+        with self._lock:
+            if job_id in self._known:
+                return
+            self._known.add(job_id)
+            self._done.setdefault(job_id, threading.Event())
+        self._queue.put((priority, next(self._sequence), job_id))
+
+    def _update(self, job_id, **fields):
+        # Only the owner writes to a running job, in case it was re-queued and claimed elsewhere meanwhile
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ? AND owner = ?", (*fields.values(), job_id, self.owner)
+            )
+            self._conn.commit()
+
+    def _claim(self, job_id):
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'running', owner = ?, heartbeat = ?, started = ?"
+                " WHERE id = ? AND status = 'queued'",
+                (self.owner, now, now, job_id),
+            )
+            self._conn.commit()
+            return cursor.rowcount == 1
+
+    def submit(self, task, *args, priority="normal"):
+        """
+        Queue a registered task and return its job id.
+        """
+        if task not in _tasks:
+            raise KeyError(f"No task registered under '{task}'.")
+        job_id = uuid.uuid4().hex[:12]
+        level = PRIORITIES[priority]
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, task, args, priority, status, created) VALUES (?, ?, ?, ?, 'queued', ?)",
+                (job_id, task, json.dumps(args), level, time.time()),
+            )
+            self._conn.commit()
+        self._enqueue(job_id, level)
+        return job_id
+
+    def status(self, job_id):
+        """
+        Return the job's state as a dict, or None if it doesn't exist.
+        """
+        with self._lock:
+            cursor = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+            row = cursor.fetchone()
+            columns = [column[0] for column in cursor.description]
+        if row is None:
+            return None
+        job = dict(zip(columns, row))
+        job["args"] = json.loads(job["args"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        job["priority"] = {level: name for name, level in PRIORITIES.items()}[job["priority"]]
+        return job
+
+    def result(self, job_id, timeout=None, poll_interval=0.5):
+        """
+        Wait for a job to finish and return its result, raising RuntimeError if it failed.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            done = self._done.get(job_id)
+        if done is not None and not done.wait(timeout):
+            raise TimeoutError(f"Job {job_id} is still running.")
+        job = self.status(job_id)
+        # Claimed by another process (or not runnable here), follow it through the database
+        while job is not None and job["status"] not in FINISHED:
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"Job {job_id} is still {job['status']}.")
+            time.sleep(poll_interval)
+            job = self.status(job_id)
+        if job is None:
+            raise KeyError(f"Unknown job '{job_id}'.")
+        if job["status"] != "done":
+            raise RuntimeError(job["error"] or f"Job {job_id} is {job['status']}.")
+        return job["result"]
+
+    def cancel(self, job_id):
+        """
+        Cancel a job that hasn't started yet. Returns True if it was cancelled.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished = ? WHERE id = ? AND status = 'queued'",
+                (time.time(), job_id),
+            )
+            self._conn.commit()
+            cancelled = cursor.rowcount > 0
+            done = self._done.get(job_id)
+        if cancelled and done is not None:
+            done.set()
+        return cancelled
+
+    def list_jobs(self, limit=50):
+        """
+        Return the most recently submitted jobs, newest first.
+        """
+        with self._lock:
+            ids = [row[0] for row in self._conn.execute(
+                "SELECT id FROM jobs ORDER BY created DESC LIMIT ?", (limit,)
+            ).fetchall()]
+        return [self.status(job_id) for job_id in ids]
+
+    def stats(self):
+        """
+        Number of jobs per status, for the metrics endpoint.
+        """
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {
+            f"resqhub_jobs_{status}": counts.get(status, 0)
+            for status in ("queued", "running", "done", "failed", "cancelled")
+        }
+
+    def _work(self):
+        while True:
+            _, _, job_id = self._queue.get()
+            try:
+                self._run(job_id)
+            except Exception as e:
+                print(f"Error running job {job_id}:", e)
+            finally:
+                with self._lock:
+                    self._known.discard(job_id)
+                    done = self._done.pop(job_id, None)
+                if done is not None:
+                    done.set()
+
+    def _run(self, job_id):
+        job = self.status(job_id)
+        if job is None or job["status"] != "queued" or job["task"] not in _tasks:
+            return
+        if not self._claim(job_id):
+            return  # Another worker or process got it first
+        fn = _tasks[job["task"]]
+
+        def report(fraction, message=""):
+            self._update(job_id, progress=float(fraction), message=str(message))
+
+        try:
+            result = fn(*job["args"], progress=report)
+            self._update(job_id, status="done", progress=1.0, result=json.dumps(result), finished=time.time())
+        except Exception as e:
+            self._update(job_id, status="failed", error=str(e), finished=time.time())
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """
+    Return the process-wide job queue, starting it on first use.
+
+    Register tasks before the first call so that jobs re-queued from a
+    previous run find their task.
+    """
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue(
+                os.getenv("JOBS_DB", os.path.join("cache", "jobs.sqlite")),
+                max_workers=int(os.getenv("JOB_WORKERS", "2")),
+            ).start()
+        return _job_queue
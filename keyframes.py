@@ -0,0 +1,174 @@
+import cv2
+import numpy as np
+
+HIST_BINS = 32
+THUMB_SIZE = (32, 32)
+CHUNK_SIZE = 64  # sampled frames analysed per vectorized batch
+
+
+def frame_histograms(frames):
+    """
+    Normalized per-channel colour histograms for a stack of frames, computed in one pass.
+
+    Args:
+        frames (np.ndarray): (N, H, W, 3) uint8 frames.
+    Returns:
+        np.ndarray: (N, 3 * HIST_BINS) float32 histograms, each channel summing to 1.
+    """
+    n = len(frames)
+    bins = (frames.reshape(n, -1, 3) // (256 // HIST_BINS)).astype(np.int64)
+    # Offset each frame and channel into its own block of bins, then count everything at once
+    offsets = (np.arange(n)[:, None, None] * 3 + np.arange(3)[None, None, :]) * HIST_BINS
+    counts = np.bincount((bins + offsets).ravel(), minlength=n * 3 * HIST_BINS)
+    hist = counts.reshape(n, 3 * HIST_BINS).astype(np.float32)
+    return hist / (frames.shape[1] * frames.shape[2])
+
+
+def scene_changes(histograms, threshold=0.25, reference=None):
+    """
+    Indices of frames whose histogram differs from the previous keyframe by more than `threshold`.
+
+    Distance is half the L1 distance averaged over channels (0 = identical, 1 = disjoint).
+    Args:
+        histograms (np.ndarray): Histograms from `frame_histograms`.
+        threshold (float): Distance that counts as a scene change.
+        reference (np.ndarray): Histogram of the last keyframe of the previous chunk, or None
+            to make the first frame a keyframe.
+    Returns:
+        Tuple: Keyframe indices and the histogram of the last keyframe.
+    """
+    if len(histograms) == 0:
+        return [], reference
+    # Distance of every frame to the running reference, refreshed only at each cut
+    keyframes = []
+    start = 0
+    if reference is None:
+        keyframes.append(0)
+        reference = histograms[0]
+        start = 1
+    while start < len(histograms):
+        distances = np.abs(histograms[start:] - reference).sum(axis=1) / 6.0
+        changed = np.flatnonzero(distances > threshold)
+        if len(changed) == 0:
+            break
+        cut = start + int(changed[0])
+        keyframes.append(cut)
+        reference = histograms[cut]
+        start = cut + 1
+    return keyframes, reference
+
+
+def deduplicate(thumbnails, indices, max_difference=6.0):
+    """
+    Drop keyframes that look nearly identical to an already kept one.
+
+    Args:
+        thumbnails (np.ndarray): (N, h, w) grayscale thumbnails.
+        indices (list): Candidate keyframe indices into `thumbnails`.
+        max_difference (float): Mean absolute pixel difference below which frames count as duplicates.
+    Returns:
+        list: Kept indices.
+    """
+    kept = []
+    for i in indices:
+        if kept:
+            # Compare with every kept frame at once, a scene may come back after a cut
+            differences = np.abs(thumbnails[kept].astype(np.int16) - thumbnails[i]).mean(axis=(1, 2))
+            if differences.min() < max_difference:
+                continue
+        kept.append(i)
+    return kept
+
+
+def extract_keyframes(video_path, sample_fps=2.0, threshold=0.25, max_difference=6.0,
+                      max_keyframes=32, max_side=768, max_duration=None):
+    """
+    Decode a video locally and keep only the frames where the scene changes.
+
+    Frames are sampled at `sample_fps` in a single forward decode pass and
+    analysed in chunks, so only scene-change frames are held at full size.
+    Keyframes are picked by colour-histogram scene-change detection and
+    near-identical ones are dropped. If there are still more than
+    `max_keyframes`, an evenly spaced subset is kept.
+    Args:
+        video_path (str): Path to the video.
+        sample_fps (float): Frames per second examined.
+        threshold (float): Histogram distance that counts as a scene change.
+        max_difference (float): Duplicate threshold, see `deduplicate`.
+        max_keyframes (int): Maximum number of frames returned.
+        max_side (int): Longest side of the returned frames.
+        max_duration (float): Only the first `max_duration` seconds are examined.
+    Returns:
+        list: (timestamp_seconds, RGB uint8 frame) pairs in time order.
+    """
+    keyframes = []  # (timestamp, BGR frame, thumbnail)
+    reference = None
+
+    def select(chunk):
+        # Histograms and scene changes for a chunk of sampled frames at once
+        nonlocal reference
+        small = np.stack([cv2.resize(frame, (64, 64), interpolation=cv2.INTER_AREA) for _, frame in chunk])
+        cuts, reference = scene_changes(frame_histograms(small), threshold, reference)
+        for i in cuts:
+            thumbnail = cv2.resize(cv2.cvtColor(small[i], cv2.COLOR_BGR2GRAY), THUMB_SIZE,
+                                   interpolation=cv2.INTER_AREA)
+            keyframes.append((chunk[i][0], chunk[i][1], thumbnail))
+        chunk.clear()
+
+    cap = cv2.VideoCapture(video_path)
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        step = max(1, int(round(fps / sample_fps)))
+        last_frame = int(max_duration * fps) if max_duration else None
+        chunk = []
+        index = 0
+        # Single forward pass; only scene-change frames are kept at full size
+        while cap.grab():
+            if last_frame is not None and index >= last_frame:
+                break
+            if index % step == 0:
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                scale = max_side / max(frame.shape[:2])
+                if scale < 1:
+                    frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+                chunk.append((index / fps, frame))
+                if len(chunk) == CHUNK_SIZE:
+                    select(chunk)
+            index += 1
+        if chunk:
+            select(chunk)
+    finally:
+        cap.release()
+    if not keyframes:
+        return []
+
+    thumbnails = np.stack([thumbnail for _, _, thumbnail in keyframes])
+    keep = deduplicate(thumbnails, list(range(len(keyframes))), max_difference)
+    if len(keep) > max_keyframes:
+        keep = [keep[i] for i in np.linspace(0, len(keep) - 1, max_keyframes, dtype=int)]
+    return [(keyframes[i][0], cv2.cvtColor(keyframes[i][1], cv2.COLOR_BGR2RGB)) for i in keep]
+
+
+def keyframe_parts(video_path, jpeg_quality=80, **options):
+    """
+    Build prompt parts for a video from its keyframes: a timestamp label followed by a JPEG for each.
+
+    Args:
+        video_path (str): Path to the video.
+        jpeg_quality (int): JPEG quality of the frames.
+        **options: Passed to `extract_keyframes`.
+    Returns:
+        list: Alternating text and `{"mime_type", "data"}` parts, ready for generate_content.
+    """
+    parts = []
+    for timestamp, frame in extract_keyframes(video_path, **options):
+        ok, encoded = cv2.imencode(".jpg", cv2.cvtColor(frame, cv2.COLOR_RGB2BGR),
+                                   [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+        if not ok:
+            continue
+        minutes, seconds = divmod(timestamp, 60)
+        parts.append(f"[Frame at {int(minutes):02d}:{seconds:04.1f}]")
+        parts.append({"mime_type": "image/jpeg", "data": encoded.tobytes()})
+    return parts
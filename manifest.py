@@ -0,0 +1,124 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+# Gemini keeps uploaded files for 48 hours
+DEFAULT_FILE_TTL = 48 * 3600
+
+# Entries this close to expiry are re-uploaded rather than reused
+EXPIRY_MARGIN = 15 * 60
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """
+    Hash a file in chunks so large recordings are never fully loaded in memory.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _timestamp(value):
+    if value is None:
+        return None
+    if hasattr(value, "timestamp"):
+        return value.timestamp()
+    return float(value)
+
+
+class UploadManifest:
+    """
+    Local SQLite record of media already uploaded to the Gemini Files API.
+
+    Uploads are keyed by content hash, size and MIME type, and map to the
+    remote file name, URI and expiry. The hash of each local path is cached
+    against its size and mtime, so unchanged files are not re-hashed.
+
+    Args:
+        path (str): Database file, created if missing.
+    """
+
+    def __init__(self, path=os.path.join("cache", "upload_manifest.sqlite")):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS fingerprints ("
+            " path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, sha256 TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS uploads ("
+            " sha256 TEXT NOT NULL, size INTEGER NOT NULL, mime_type TEXT NOT NULL,"
+            " name TEXT NOT NULL, uri TEXT NOT NULL, uploaded_at REAL NOT NULL, expires_at REAL NOT NULL,"
+            " PRIMARY KEY (sha256, size, mime_type));"
+        )
+        self._conn.commit()
+
+    def fingerprint(self, path):
+        """
+        Return (sha256, size) for a local file, hashing it only if it changed.
+        """
+        stat = os.stat(path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sha256 FROM fingerprints WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (path, stat.st_size, stat.st_mtime_ns),
+            ).fetchone()
+        if row is not None:
+            return row[0], stat.st_size
+        sha256 = file_sha256(path)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO fingerprints (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, sha256),
+            )
+            self._conn.commit()
+        return sha256, stat.st_size
+
+    def lookup(self, sha256, size, mime_type=None):
+        """
+        Return the remote file name and URI for unexpired uploaded content, or None.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT name, uri, expires_at FROM uploads WHERE sha256 = ? AND size = ? AND mime_type = ?",
+                (sha256, size, mime_type or ""),
+            ).fetchone()
+        if row is None or row[2] - EXPIRY_MARGIN <= time.time():
+            return None
+        return {"name": row[0], "uri": row[1], "expires_at": row[2]}
+
+    def record(self, sha256, size, mime_type, file):
+        """
+        Remember an uploaded Gemini file for the given content.
+        """
+        now = time.time()
+        expires_at = _timestamp(getattr(file, "expiration_time", None)) or now + DEFAULT_FILE_TTL
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO uploads (sha256, size, mime_type, name, uri, uploaded_at, expires_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (sha256, size, mime_type or "", file.name, file.uri, now, expires_at),
+            )
+            self._conn.commit()
+
+    def forget(self, sha256, size, mime_type=None):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM uploads WHERE sha256 = ? AND size = ? AND mime_type = ?",
+                (sha256, size, mime_type or ""),
+            )
+            self._conn.commit()
+
+    def prune(self):
+        """
+        Delete expired uploads, returning how many were removed.
+        """
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM uploads WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+            return cursor.rowcount
@@ -0,0 +1,235 @@
+import functools
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Fraction of spans whose latency is recorded; error counts and in-flight gauges are always exact
+SAMPLE_RATE = float(os.getenv("METRICS_SAMPLE_RATE", "1.0"))
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, label_values)} {value}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+    def set(self, *label_values, value):
+        with self._lock:
+            self._values[label_values] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            state = self._values.get(label_values)
+            if state is None:
+                state = self._values[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        bucket_names = self.labelnames + ("le",)
+        with self._lock:
+            for label_values, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{self.name}_bucket{_labels(bucket_names, label_values + (bound,))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_labels(bucket_names, label_values + ('+Inf',))} {count}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, label_values)} {total}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, label_values)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Holds metrics and renders them in the Prometheus text exposition format.
+
+    Collectors are callables returning {metric_name: value} that are turned
+    into gauges at scrape time, for state that lives elsewhere (cache
+    counters, model load times).
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, help_text, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, labelnames, **kwargs)
+            return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._get_or_create(Counter, name, help_text, labelnames)
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._get_or_create(Gauge, name, help_text, labelnames)
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def add_collector(self, collector):
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for collector in collectors:
+            try:
+                values = collector()
+            except Exception as e:
+                print("Error collecting metrics:", e)
+                continue
+            for name, value in sorted(values.items()):
+                if value is None:
+                    continue
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {float(value)}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+STAGE_SECONDS = metrics.histogram("resqhub_stage_seconds", "Time spent per pipeline stage.", ("stage",))
+STAGE_ERRORS = metrics.counter("resqhub_stage_errors_total", "Errors raised per pipeline stage.", ("stage", "error"))
+STAGE_IN_FLIGHT = metrics.gauge("resqhub_stage_in_flight", "Calls currently running per pipeline stage.", ("stage",))
+
+
+class span:
+    """
+    Time a pipeline stage, as a context manager or a decorator.
+
+        with span("gemini_generate"):
+            ...
+
+        @span("yolo_inference")
+        def run(...):
+            ...
+
+    Latency goes to `resqhub_stage_seconds` for a `sample_rate` fraction of
+    calls. Exceptions are counted in `resqhub_stage_errors_total` by type
+    and re-raised; cancellations such as GeneratorExit are not counted. In-flight calls are tracked in `resqhub_stage_in_flight`.
+    """
+
+    def __init__(self, stage, sample_rate=None):
+        self.stage = stage
+        self.sample_rate = SAMPLE_RATE if sample_rate is None else sample_rate
+        self._started = None
+
+    def __enter__(self):
+        STAGE_IN_FLIGHT.inc(self.stage)
+        self._started = time.perf_counter() if random.random() < self.sample_rate else None
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        STAGE_IN_FLIGHT.dec(self.stage)
+        # A closed generator (GeneratorExit) or an interrupt is a cancellation, not a failure of the stage
+        if exc_type is not None and issubclass(exc_type, Exception):
+            STAGE_ERRORS.inc(self.stage, exc_type.__name__)
+        if self._started is not None:
+            STAGE_SECONDS.observe(time.perf_counter() - self._started, self.stage)
+        return False
+
+    def __call__(self, fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            # A fresh span per call, so the decorator is safe to use from many threads
+            with span(self.stage, self.sample_rate):
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+def record_error(stage, error):
+    """
+    Count an error that was handled (e.g. turned into a message) instead of raised.
+    """
+    STAGE_ERRORS.inc(stage, type(error).__name__)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes would otherwise flood the console
+
+
+def start_metrics_server(port=9464, host="0.0.0.0"):
+    """
+    Serve /metrics in a daemon thread and return the server.
+    """
+    server = ThreadingHTTPServer((host, port), _Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    print(f"Metrics available at http://{host}:{port}/metrics")
+    return server
@@ -1,47 +1,36 @@
 import gradio as gr
-import cv2
-import numpy as np
-import tensorflow as tf
-from moviepy.editor import VideoFileClip # type: ignore
 import os
+from registry import registry
+# Frame decoding, the model loader and scoring live in modules without UI side effects,
+# so CLIs, workers and the benchmark can import them
+from deepfake_model import detect_deepfake
+from jobs import get_job_queue, register_task
 
-# Load the trained deepfake detection model
-MODEL_PATH = "models/final_model6.h5"  # Update with your actual model path
-model = tf.keras.models.load_model(MODEL_PATH)
-
-# Function to extract frames from the video
-def extract_frames(video_path, num_frames=10):
-    cap = cv2.VideoCapture(video_path)
-    frames = []
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    frame_indices = np.linspace(0, total_frames - 1, num_frames, dtype=int)
-    
-    for i in frame_indices:
-        cap.set(cv2.CAP_PROP_POS_FRAMES, i)
-        ret, frame = cap.read()
-        if ret:
-            frame = cv2.resize(frame, (224, 224))  # Adjust based on model input size
-            frame = frame / 255.0  # Normalize
-            frames.append(frame)
-    
-    cap.release()
-    return np.array(frames)
-
-# Deepfake detection function
-def detect_deepfake(video_path):
-    frames = extract_frames(video_path)
-    
-    if len(frames) == 0:
-        return "Error: No valid frames extracted from video."
-    
-    frames = np.expand_dims(frames, axis=0)  # Add batch dimension
-    prediction = model.predict(frames)  # Get predictions
-    
-    # Assuming the model outputs a probability (adjust threshold as needed)
-    deepfake_score = np.mean(prediction)
-    result = "Deepfake Detected" if deepfake_score > 0.5 else "Real Video"
-    
-    return result
+# Background job version, so long videos don't hold a UI worker thread
+def detect_deepfake_job(video_path, progress=None):
+    if progress is not None:
+        progress(0.1, "Scoring video")
+    return {"video": video_path, "result": detect_deepfake(video_path)}
+
+register_task("deepfake", detect_deepfake_job)
+
+# Function to queue a video and return its job id
+def queue_deepfake(video_path):
+    if not video_path:
+        return "", "Please upload a video."
+    job_id = get_job_queue().submit("deepfake", video_path, priority="bulk")
+    return job_id, f"Queued as job {job_id}."
+
+# Function to report the state of a queued job
+def job_status(job_id):
+    job = get_job_queue().status((job_id or "").strip())
+    if job is None:
+        return "Unknown job id."
+    if job["status"] == "done":
+        return job["result"]["result"]
+    if job["status"] == "failed":
+        return f"Error: {job['error']}"
+    return f"{job['status'].capitalize()} ({job['progress']:.0%}) {job['message']}".strip()
 
 # Gradio Interface
 iface = gr.Interface(
@@ -52,6 +41,26 @@ iface = gr.Interface(
     description="Upload a video to check if it's real or a deepfake."
 )
 
+# Queue long videos and check back on them later
+with gr.Blocks() as queue_iface:
+    gr.Markdown("Queue a video for background scoring and check its result with the job id.")
+    queue_video = gr.Video(label="Upload a Video")
+    queue_button = gr.Button("Queue", variant="primary")
+    queue_job_id = gr.Textbox(label="Job ID")
+    status_button = gr.Button("Check Status")
+    queue_status = gr.Textbox(label="Status")
+
+    queue_button.click(queue_deepfake, inputs=queue_video, outputs=[queue_job_id, queue_status])
+    status_button.click(job_status, inputs=queue_job_id, outputs=queue_status)
+
+demo = gr.TabbedInterface([iface, queue_iface], ["Detect", "Background Queue"])
+
 # Run the app
-iface.launch()
+if __name__ == "__main__":
+    # Load the model in the background while the UI starts
+    if os.getenv("WARM_MODELS", "1") != "0":
+        registry.warm(["deepfake"])
+    # Resume jobs left over from the previous run
+    get_job_queue()
+    demo.launch()
 
@@ -0,0 +1,159 @@
+import os
+import threading
+import time
+
+try:
+    import psutil
+except ImportError:  # psutil is optional, fall back to /proc
+    psutil = None
+
+
+def _rss_bytes():
+    """
+    Return the resident memory of this process in bytes (0 if unknown).
+    """
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+class _Entry:
+    def __init__(self, loader):
+        self.loader = loader
+        self.instance = None
+        self.loaded = False
+        self.loading = False
+        self.lock = threading.Lock()
+        self.load_seconds = None
+        self.rss_delta_bytes = None
+        self.error = None
+
+
+class ModelRegistry:
+    """
+    Process-wide registry that loads each model on first use and keeps one instance.
+
+    Models are registered with a zero-argument loader. Nothing is loaded at
+    import time; the first `get` pays the load cost, and `warm` can do it
+    ahead of time in a background thread. Load time and the change in
+    resident memory are recorded per model.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, loader):
+        """
+        Register a loader for `name`. Re-registering replaces the loader only while the model
+        is neither loaded nor being loaded, so a re-import can't discard a warm-up in progress.
+        """
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or not (entry.loaded or entry.loading):
+                self._entries[name] = _Entry(loader)
+
+    def _entry(self, name):
+        with self._lock:
+            if name not in self._entries:
+                raise KeyError(f"No model registered under '{name}'.")
+            return self._entries[name]
+
+    def get(self, name):
+        """
+        Return the model instance for `name`, loading it if needed.
+        """
+        entry = self._entry(name)
+        if entry.loaded:
+            return entry.instance
+        with entry.lock:
+            if not entry.loaded:
+                with self._lock:
+                    replaced = self._entries.get(name) is not entry
+                    entry.loading = not replaced
+                if replaced:
+                    # Re-registered after we looked it up, load the current entry instead
+                    return self.get(name)
+                rss_before = _rss_bytes()
+                started = time.perf_counter()
+                try:
+                    entry.instance = entry.loader()
+                except Exception as e:
+                    entry.error = str(e)
+                    raise
+                finally:
+                    entry.loading = False
+                entry.load_seconds = time.perf_counter() - started
+                entry.rss_delta_bytes = _rss_bytes() - rss_before
+                entry.error = None
+                entry.loaded = True
+                print(f"Loaded model '{name}' in {entry.load_seconds:.2f}s "
+                      f"(+{entry.rss_delta_bytes / 2**20:.0f} MB resident)")
+        return entry.instance
+
+    def override(self, name, instance):
+        """
+        Install a ready-made instance for `name`, e.g. a stand-in for benchmarks.
+        """
+        entry = _Entry(lambda: instance)
+        entry.instance = instance
+        entry.loaded = True
+        entry.load_seconds = 0.0
+        entry.rss_delta_bytes = 0
+        with self._lock:
+            self._entries[name] = entry
+
+    def is_loaded(self, name):
+        return self._entry(name).loaded
+
+    def warm(self, names=None, background=True):
+        """
+        Load the given models (all registered ones by default).
+
+        Args:
+            names (list): Models to load.
+            background (bool): Load in a daemon thread and return it immediately.
+        Returns:
+            threading.Thread or None: The loading thread when `background` is set.
+        """
+        if names is None:
+            with self._lock:
+                names = list(self._entries)
+
+        def load_all():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    print(f"Error warming model '{name}':", e)
+
+        if not background:
+            load_all()
+            return None
+        thread = threading.Thread(target=load_all, name="model-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self):
+        """
+        Return load state, load time and resident memory growth per model.
+        """
+        with self._lock:
+            entries = dict(self._entries)
+        return {
+            name: {
+                "loaded": entry.loaded,
+                "load_seconds": entry.load_seconds,
+                "rss_delta_bytes": entry.rss_delta_bytes,
+                "error": entry.error,
+            }
+            for name, entry in entries.items()
+        }
+
+
+# Shared registry for every model used in this process
+registry = ModelRegistry()
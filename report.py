@@ -0,0 +1,75 @@
+import os
+import time
+import uuid
+
+from jobs import register_task
+
+REPORTS_DIR = os.getenv("REPORTS_DIR", "reports")
+
+
+def generate_report(output_path, title, sections, image_path=None):
+    """
+    Write a PDF report with an optional image followed by titled text sections.
+
+    Requires reportlab (`pip install reportlab`), which is only imported here.
+    Args:
+        output_path (str): Where to write the PDF.
+        title (str): Report title.
+        sections (list): (heading, text) pairs.
+        image_path (str): Image shown under the title.
+    Returns:
+        str: `output_path`.
+    """
+    try:
+        from reportlab.lib.pagesizes import A4
+        from reportlab.lib.styles import getSampleStyleSheet
+        from reportlab.lib.units import cm
+        from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer
+    except ImportError as e:
+        raise RuntimeError("PDF reports need reportlab, install it with `pip install reportlab`.") from e
+    from xml.sax.saxutils import escape
+
+    styles = getSampleStyleSheet()
+    story = [
+        Paragraph(escape(title), styles["Title"]),
+        Paragraph(time.strftime("Generated %Y-%m-%d %H:%M"), styles["Normal"]),
+        Spacer(1, 0.5 * cm),
+    ]
+    if image_path:
+        from PIL import Image as PILImage
+        with PILImage.open(image_path) as img:
+            width, height = img.size
+        scale = min(16 * cm / width, 12 * cm / height)
+        story += [Image(image_path, width=width * scale, height=height * scale), Spacer(1, 0.5 * cm)]
+    for heading, text in sections:
+        story.append(Paragraph(escape(heading), styles["Heading2"]))
+        for paragraph in str(text).split("\n\n"):
+            story.append(Paragraph(escape(paragraph).replace("\n", "<br/>"), styles["BodyText"]))
+
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    SimpleDocTemplate(output_path, pagesize=A4, title=title).build(story)
+    return output_path
+
+
+def image_report_job(image_path, prompt, progress=None):
+    """
+    Background job: analyze an image with Gemini and write the findings to a PDF report.
+    Returns:
+        dict: The report path and the analysis text.
+    """
+    from backend import analyze_image_bytes
+
+    if progress is not None:
+        progress(0.1, "Analyzing image")
+    with open(image_path, "rb") as f:
+        analysis = analyze_image_bytes(f.read(), prompt, request_class="report")
+    if progress is not None:
+        progress(0.7, "Writing report")
+    output_path = os.path.join(REPORTS_DIR, time.strftime("report_%Y%m%d_%H%M%S_") + uuid.uuid4().hex[:8] + ".pdf")
+    generate_report(output_path, "ResQHub Medical Report", [("Question", prompt), ("Findings", analysis)], image_path)
+    return {"report": output_path, "analysis": analysis}
+
+
+register_task("image_report", image_report_job)
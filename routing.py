@@ -0,0 +1,159 @@
+import random
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+
+class Route:
+    """
+    A model and generation config serving one class of requests.
+
+    Args:
+        name (str): Route name, used in metrics.
+        model_name (str): Gemini model.
+        generation_config (dict): Generation settings.
+        slo_seconds (float): p95 latency above which the route counts as degraded.
+        fallback (str): Name of the faster route used while this one is degraded.
+    """
+
+    def __init__(self, name, model_name, generation_config, slo_seconds, fallback=None):
+        self.name = name
+        self.model_name = model_name
+        self.generation_config = dict(generation_config)
+        self.slo_seconds = slo_seconds
+        self.fallback = fallback
+
+    def config(self):
+        """
+        Everything about the route that affects its output, e.g. for cache keys.
+        """
+        return {"model": self.model_name, **self.generation_config}
+
+
+class _RouteStats:
+    def __init__(self, window_seconds, max_samples):
+        self.window_seconds = window_seconds
+        self.samples = deque(maxlen=max_samples)  # (timestamp, seconds, error)
+        self.requests = 0
+        self.fallbacks = 0
+
+    def recent(self, now):
+        while self.samples and now - self.samples[0][0] > self.window_seconds:
+            self.samples.popleft()
+        return self.samples
+
+
+class _Tracker:
+    def __init__(self, router, route):
+        self.router = router
+        self.route = route
+        self._started = None
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self.route
+
+    def __exit__(self, exc_type, exc, tb):
+        # Cancellations (GeneratorExit, KeyboardInterrupt) say nothing about the route's health
+        if exc_type is None or issubclass(exc_type, Exception):
+            self.router.observe(self.route, time.perf_counter() - self._started, error=exc_type is not None)
+        return False
+
+
+class Router:
+    """
+    Pick a route per request class and fall back to faster routes when one breaches its SLO.
+
+    Latency and errors are tracked per route over a sliding time window.
+    A route is degraded when it has at least `min_samples` recent calls and
+    either their p95 latency exceeds its SLO or their error rate exceeds
+    `max_error_rate`. A degraded route's requests go to its fallback (and
+    on down the chain), except for a `probe_rate` fraction that keeps
+    measuring it so it is used again once it recovers.
+
+    Args:
+        routes (list): Route objects.
+        classes (dict): Request class -> route name.
+        window_seconds (float): How long observations count.
+        min_samples (int): Recent calls needed before a route can be judged.
+        max_error_rate (float): Error rate that counts as degraded.
+        probe_rate (float): Fraction of a degraded route's traffic still sent to it.
+    """
+
+    def __init__(self, routes, classes, window_seconds=300.0, min_samples=20, max_error_rate=0.2,
+                 probe_rate=0.05, max_samples=1000):
+        self.routes = {route.name: route for route in routes}
+        self.classes = dict(classes)
+        self.min_samples = min_samples
+        self.max_error_rate = max_error_rate
+        self.probe_rate = probe_rate
+        self._lock = threading.Lock()
+        self._stats = {name: _RouteStats(window_seconds, max_samples) for name in self.routes}
+
+    def _health_locked(self, name, now):
+        samples = self._stats[name].recent(now)
+        if not samples:
+            return 0, None, 0.0
+        latencies = np.fromiter((seconds for _, seconds, _ in samples), dtype=np.float64, count=len(samples))
+        errors = sum(error for _, _, error in samples)
+        return len(samples), float(np.percentile(latencies, 95)), errors / len(samples)
+
+    def _degraded_locked(self, route, now):
+        count, p95, error_rate = self._health_locked(route.name, now)
+        if count < self.min_samples:
+            return False
+        return p95 > route.slo_seconds or error_rate > self.max_error_rate
+
+    def choose(self, request_class):
+        """
+        Return the route to use for a request of the given class.
+        """
+        route = self.routes[self.classes[request_class]]
+        now = time.monotonic()
+        with self._lock:
+            self._stats[route.name].requests += 1
+            visited = {route.name}
+            while (route.fallback and route.fallback not in visited
+                   and self._degraded_locked(route, now) and random.random() >= self.probe_rate):
+                self._stats[route.name].fallbacks += 1
+                route = self.routes[route.fallback]
+                visited.add(route.name)
+        return route
+
+    def observe(self, route, seconds, error=False):
+        with self._lock:
+            self._stats[route.name].samples.append((time.monotonic(), seconds, bool(error)))
+
+    def track(self, route):
+        """
+        Context manager timing a call on `route`; exceptions count as errors and are re-raised.
+        """
+        return _Tracker(self, route)
+
+    def stats(self):
+        """
+        Per-route request counts, fallbacks, recent p95 latency, error rate and degraded flag.
+        """
+        now = time.monotonic()
+        with self._lock:
+            stats = {}
+            for name, route in self.routes.items():
+                count, p95, error_rate = self._health_locked(name, now)
+                stats[name] = {
+                    "requests": self._stats[name].requests,
+                    "fallbacks": self._stats[name].fallbacks,
+                    "recent_calls": count,
+                    "p95_seconds": p95,
+                    "error_rate": error_rate,
+                    "degraded": int(self._degraded_locked(route, now)),
+                }
+            return stats
+
+
+def classify_text(prompt, triage_max_chars=280):
+    """
+    Request class of a stateless text query: short questions are "triage", the rest "chat".
+    """
+    return "triage" if len(" ".join((prompt or "").split())) <= triage_max_chars else "chat"
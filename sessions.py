@@ -0,0 +1,217 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+def _message_size(message):
+    """
+    Approximate the memory held by one chat message (Content proto or dict).
+    """
+    parts = message.get("parts", []) if isinstance(message, dict) else getattr(message, "parts", [])
+    size = 0
+    for part in parts:
+        if isinstance(part, str):
+            size += len(part)
+        else:
+            size += len(getattr(part, "text", "") or "")
+    return size
+
+
+def _cancel_stream(response):
+    """
+    Abort the upstream generation behind a streaming response.
+    """
+    # The gRPC call is only reachable through the response's private iterator
+    iterator = getattr(response, "_iterator", None)
+    if hasattr(iterator, "cancel"):
+        iterator.cancel()
+
+
+def stream_text(response):
+    """
+    Yield the text of a streaming response, aborting the upstream generation
+    if the consumer stops before the end.
+    """
+    completed = False
+    try:
+        for chunk in response:
+            text = getattr(chunk, "text", "")
+            if text:
+                yield text
+        completed = True
+    finally:
+        if not completed:
+            _cancel_stream(response)
+
+
+class _Session:
+    def __init__(self, chat):
+        self.chat = chat
+        self.last_used = time.monotonic()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.cancelled = threading.Event()
+
+
+class ChatSessionManager:
+    """
+    Keeps one Gemini chat per Gradio session, with bounded history and memory.
+
+    Sessions are held in LRU order. A session is evicted when it has been idle
+    for longer than `ttl_seconds`, when more than `max_sessions` are open, or
+    when the total history size of all sessions exceeds `memory_budget_chars`.
+    Each session keeps at most `max_history_messages` messages, so the context
+    re-sent on every turn stays bounded.
+
+    Args:
+        model_factory (callable): Returns the GenerativeModel used to start chats.
+        max_sessions (int): Maximum number of concurrent sessions.
+        ttl_seconds (float): Idle time after which a session is dropped.
+        max_history_messages (int): Messages kept per session (user + model).
+        memory_budget_chars (int): Global cap on stored history text.
+    """
+
+    def __init__(self, model_factory, max_sessions=500, ttl_seconds=1800,
+                 max_history_messages=20, memory_budget_chars=20_000_000):
+        self.model_factory = model_factory
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_history_messages = max_history_messages
+        self.memory_budget_chars = memory_budget_chars
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._total_size = 0
+        self.evictions = 0
+
+    def _evict_locked(self, keep=None):
+        now = time.monotonic()
+        for session_id in list(self._sessions):
+            if session_id != keep and now - self._sessions[session_id].last_used > self.ttl_seconds:
+                self._drop_locked(session_id)
+        while self._sessions and (
+            len(self._sessions) > self.max_sessions or self._total_size > self.memory_budget_chars
+        ):
+            oldest = next(iter(self._sessions))
+            if oldest == keep:
+                break
+            self._drop_locked(oldest)
+
+    def _drop_locked(self, session_id, evicted=True):
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            # Stops any response still streaming for this session
+            session.cancelled.set()
+            self._total_size -= session.size
+            if evicted:
+                self.evictions += 1
+
+    def get(self, session_id):
+        """
+        Return the session for `session_id`, starting a new chat if needed.
+        """
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = _Session(self.model_factory().start_chat(history=[]))
+                self._sessions[session_id] = session
+            else:
+                self._sessions.move_to_end(session_id)
+            session.last_used = time.monotonic()
+            self._evict_locked(keep=session_id)
+            return session
+
+    def trim(self, session_id):
+        """
+        Cap the stored history of a session and update the memory accounting.
+        """
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return
+            history = list(session.chat.history)
+            if len(history) > self.max_history_messages:
+                history = history[-self.max_history_messages:]
+                # Never start the history on a model turn
+                while history and getattr(history[0], "role", "user") != "user":
+                    history = history[1:]
+                session.chat.history = history
+            size = sum(_message_size(message) for message in history)
+            self._total_size += size - session.size
+            session.size = size
+            self._evict_locked(keep=session_id)
+
+    def send_message(self, session_id, prompt, model=None):
+        """
+        Send a prompt in the given session and return the model response.
+        A `model` given here answers this and later turns in place of the session's current one.
+        """
+        session = self.get(session_id)
+        # A ChatSession is not safe for concurrent sends from the same user
+        with session.lock:
+            if model is not None:
+                session.chat.model = model
+            response = session.chat.send_message(prompt)
+        self.trim(session_id)
+        return response
+
+    def stream_message(self, session_id, prompt, model=None):
+        """
+        Send a prompt in the given session and yield the response text as it arrives.
+        `model` is handled as in `send_message`.
+
+        The stream stops early when `cancel` or `reset` is called for the
+        session, or when the consumer closes the generator. An interrupted
+        exchange leaves the chat without a complete reply, so the session is
+        dropped and the next message starts a fresh conversation.
+        """
+        session = self.get(session_id)
+        session.cancelled.clear()
+        completed = False
+        try:
+            with session.lock:
+                if model is not None:
+                    session.chat.model = model
+                response = session.chat.send_message(prompt, stream=True)
+                try:
+                    for chunk in response:
+                        if session.cancelled.is_set():
+                            break
+                        text = getattr(chunk, "text", "")
+                        if text:
+                            yield text
+                    else:
+                        completed = True
+                finally:
+                    if not completed:
+                        _cancel_stream(response)
+        finally:
+            if completed:
+                self.trim(session_id)
+            else:
+                with self._lock:
+                    if self._sessions.get(session_id) is session:
+                        self._drop_locked(session_id, evicted=False)
+
+    def cancel(self, session_id):
+        """
+        Stop the response currently streaming for a session, if any.
+        """
+        with self._lock:
+            session = self._sessions.get(session_id)
+        if session is not None:
+            session.cancelled.set()
+
+    def reset(self, session_id):
+        """
+        Forget the conversation for a session.
+        """
+        with self._lock:
+            self._drop_locked(session_id, evicted=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "history_chars": self._total_size,
+                "evictions": self.evictions,
+            }
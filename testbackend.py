@@ -1,8 +1,84 @@
-from ultralytics import YOLO
-from PIL import Image, ImageDraw
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+import cv2
+import numpy as np
+from PIL import Image
+from registry import registry
+from metrics import record_error, span
+
+# Function to load the YOLO model, run on first use
+def _load_yolo():
+    from ultralytics import YOLO
+    return YOLO("yolov8n.pt")
+
+registry.register("yolo", _load_yolo)
+
+def get_yolo_model():
+    """
+    Return the shared YOLO model, loading it on first use.
+    """
+    return registry.get("yolo")
 
-# Load YOLO model
-model = YOLO("yolov8n.pt")
+BOX_COLOR = (255, 0, 0)
+BOX_WIDTH = 3
+
+def _draw_boxes(image, boxes):
+    """
+    Return a copy of an RGB uint8 array with box outlines drawn on it.
+    """
+    annotated = image.copy()
+    for x1, y1, x2, y2 in np.rint(boxes).astype(np.int64).tolist():
+        cv2.rectangle(annotated, (x1, y1), (x2, y2), BOX_COLOR, BOX_WIDTH)
+    return annotated
+
+def detect_objects_yolo_batch(image_paths, batch_size=16, imgsz=640, half=False, conf=0.25, annotate=True):
+    """
+    Detect objects in many images, running YOLO on `batch_size` images per forward pass.
+    Args:
+        image_paths (list): Paths to the input images.
+        batch_size (int): Images per forward pass.
+        imgsz (int): Inference image size.
+        half (bool): Use FP16 inference (only takes effect on GPU).
+        conf (float): Minimum confidence for a detection.
+        annotate (bool): Whether to render annotated images.
+    Returns:
+        list: One dict per image with keys "image" (path), "annotated" (PIL image or None),
+        "detections" (list of {"class", "confidence", "box"}) and the raw NumPy arrays
+        "boxes" (N, 4), "confidences" (N,) and "class_ids" (N,).
+    """
+    outputs = []
+    for start in range(0, len(image_paths), batch_size):
+        chunk = list(image_paths[start:start + batch_size])
+        with span("yolo_inference"):
+            results = get_yolo_model().predict(chunk, batch=len(chunk), imgsz=imgsz, half=half, conf=conf, verbose=False)
+        for path, result in zip(chunk, results):
+            # Pull every box out of the tensors in one transfer per field
+            boxes = result.boxes.xyxy.cpu().numpy()
+            confidences = result.boxes.conf.cpu().numpy()
+            class_ids = result.boxes.cls.cpu().numpy().astype(np.int64)
+
+            detections = [
+                {"class": result.names[class_id], "confidence": round(confidence, 4), "box": box}
+                for class_id, confidence, box in zip(class_ids.tolist(), confidences.tolist(), boxes.round(1).tolist())
+            ]
+
+            annotated = None
+            if annotate:
+                # orig_img is the already decoded BGR frame, no need to reopen the file
+                with span("yolo_render"):
+                    rgb = np.ascontiguousarray(result.orig_img[..., ::-1])
+                    annotated = Image.fromarray(_draw_boxes(rgb, boxes))
+
+            outputs.append({
+                "image": path,
+                "annotated": annotated,
+                "detections": detections,
+                "boxes": boxes,
+                "confidences": confidences,
+                "class_ids": class_ids,
+            })
+    return outputs
 
 def detect_objects_yolo(image_path):
     """
@@ -13,34 +89,11 @@ def detect_objects_yolo(image_path):
         Tuple: Annotated image and text description of detections.
     """
     try:
-        # Run YOLO on the input image
-        results = model(image_path)
-
-        # Load the original image
-        img = Image.open(image_path).convert("RGB")
-        draw = ImageDraw.Draw(img)
-
-        detections_text = []  # List to store detection descriptions
-
-        # Process results and draw bounding boxes
-        for result in results:
-            for box in result.boxes:  # Loop through detected boxes
-                # Get the class name, confidence score, and bounding box coordinates
-                cls = result.names[box.cls[0].item()]  # Class name (e.g., "person")
-                confidence = box.conf[0].item()  # Confidence score
-                bbox = box.xyxy[0].tolist()  # Bounding box coordinates [x1, y1, x2, y2]
-
-                # Draw bounding box
-                x1, y1, x2, y2 = bbox
-                draw.rectangle([x1, y1, x2, y2], outline="red", width=3)
-
-                # Prepare detection description
-                detections_text.append(f"{cls} ({confidence:.2f})")
-
-        # Combine detections into a single text
-        detections_text = ", ".join(detections_text)
-
-        return img, detections_text
+        result = detect_objects_yolo_batch([image_path], batch_size=1)[0]
+        detections_text = ", ".join(
+            f"{detection['class']} ({detection['confidence']:.2f})" for detection in result["detections"]
+        )
+        return result["annotated"], detections_text
 
     except Exception as e:
         print("Error in YOLO detection:", e)
@@ -49,61 +102,92 @@ def detect_objects_yolo(image_path):
 
 
 
-import os
-from google.cloud import texttospeech
+from tts import synthesize_speech
+from backend import analyze_image_bytes
+
+# Seconds the LLM call waits for YOLO so detections can be included in its prompt
+DETECTION_WAIT_SECONDS = float(os.getenv("DETECTION_WAIT_SECONDS", "0.3"))
+
+_pipeline_executor = ThreadPoolExecutor(max_workers=int(os.getenv("DETECTION_WORKERS", "2")), thread_name_prefix="yolo")
 
 def generate_gemini_text(detections):
     """
-    Generate enhanced text using Google Text-to-Speech API (or another Gemini approach).
+    Generate enhanced text and speak it using Google Text-to-Speech.
+
+    The text is split into sentences that are synthesized concurrently on a
+    shared client, and sentences spoken before come from the audio cache.
+    Speech is best effort: if synthesis fails the text is still returned unchanged.
+    Returns:
+        Tuple: The text and its MP3 audio (None if synthesis failed).
     """
     try:
-        # Set credentials programmatically
-        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "path/to/your/service-account-key.json"
-
-        # Initialize the Text-to-Speech client
-        client = texttospeech.TextToSpeechClient()
-
-        # Configure synthesis input
-        synthesis_input = texttospeech.SynthesisInput(text=detections)
-
-        # Select the voice
-        voice = texttospeech.VoiceSelectionParams(
-            language_code="en-US",
-            ssml_gender=texttospeech.SsmlVoiceGender.NEUTRAL
-        )
-
-        # Configure audio output
-        audio_config = texttospeech.AudioConfig(audio_encoding=texttospeech.AudioEncoding.MP3)
-
-        # Perform text-to-speech synthesis
-        response = client.synthesize_speech(
-            input=synthesis_input, voice=voice, audio_config=audio_config
-        )
-
-        # Return the generated text as a fallback
-        return detections
+        audio = synthesize_speech(detections, language_code="en-US", gender="NEUTRAL", encoding="MP3")
+        return detections, audio
 
     except Exception as e:
-        print("Error in Gemini text generation:", e)
-        return "An error occurred while generating enhanced text."
+        print("Error in text-to-speech synthesis:", e)
+        record_error("text_to_speech", e)
+        return detections, None
 
 
-def process_image_with_prompt(image_path, prompt):
+def _format_detections(detections):
+    return json.dumps([
+        {"class": d["class"], "confidence": d["confidence"], "box": d["box"]} for d in detections
+    ])
+
+def process_image_with_prompt(image_path, prompt, detection_wait=DETECTION_WAIT_SECONDS, speak=True):
     """
-    Process the image and prompt by detecting objects with YOLO and enhancing text with Gemini.
+    Answer a prompt about an image with Gemini while YOLO runs on the same image.
+
+    Detection starts first. If it finishes within `detection_wait` seconds, its
+    structured detections are added to the prompt; otherwise the Gemini call
+    starts without them and the detections are attached to the result once
+    they arrive, so end-to-end latency is about max(detection, LLM) rather
+    than their sum. The answer is cached under the user prompt alone, so
+    repeats hit the cache whether or not detections made it in time.
+    Args:
+        image_path (str): Path to the input image.
+        prompt (str): User prompt.
+        detection_wait (float): Seconds the LLM call may wait for detections.
+        speak (bool): Whether to synthesize audio for the answer.
+    Returns:
+        Tuple: Annotated image, answer text, answer audio (or None) and the list of detections.
     """
-    # Detect objects with YOLO
-    detection_result, detections_text = detect_objects_yolo(image_path)
+    detection_future = _pipeline_executor.submit(detect_objects_yolo_batch, [image_path], 1)
 
-    # Handle cases where no detections are made
-    if not detections_text:
-        detections_text = "No objects detected in the image."
+    full_prompt = prompt
+    try:
+        early = detection_future.result(timeout=detection_wait)[0]
+        if early["detections"]:
+            full_prompt = (
+                f"{prompt}\n\nObjects detected in the image (class, confidence, box as "
+                f"[x1, y1, x2, y2] pixels): {_format_detections(early['detections'])}"
+            )
+        else:
+            full_prompt = f"{prompt}\n\nNo objects were detected in the image."
+    except FuturesTimeoutError:
+        pass  # Detection is still running, the LLM call goes ahead without it
+    except Exception as e:
+        print("Error in YOLO detection:", e)  # Counted below, when the same future is read again
 
-    # Append the user prompt
-    full_prompt = f"Detections: {detections_text}. User prompt: {prompt}"
+    try:
+        with open(image_path, "rb") as f:
+            answer = analyze_image_bytes(f.read(), full_prompt, cache_prompt=prompt)
+    except Exception as e:
+        record_error("process_image_with_prompt", e)
+        answer = f"Error analyzing image: {str(e)}"
 
-    # Generate enhanced text using Gemini
-    enhanced_text = generate_gemini_text(full_prompt)
+    try:
+        result = detection_future.result()[0]
+        detection_result, detections = result["annotated"], result["detections"]
+    except Exception as e:
+        print("Error in YOLO detection:", e)
+        record_error("process_image_with_prompt", e)
+        detection_result, detections = None, []
 
-    return detection_result, enhanced_text
+    # Speech is a separate best-effort step, it never replaces the answer
+    audio = None
+    if speak:
+        _, audio = generate_gemini_text(answer)
 
+    return detection_result, answer, audio, detections
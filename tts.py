@@ -0,0 +1,109 @@
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import LRUCache
+from metrics import span
+from registry import registry
+
+# Synthesized audio by (text, language, gender, encoding), so repeated phrases and disclaimers are free
+audio_cache = LRUCache(
+    max_items=int(os.getenv("TTS_CACHE_ITEMS", "2048")),
+    max_bytes=int(os.getenv("TTS_CACHE_BYTES", str(64 * 1024 * 1024))),
+)
+
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("TTS_WORKERS", "4")), thread_name_prefix="tts")
+
+
+def _load_client():
+    from google.cloud import texttospeech
+    # Set credentials programmatically, unless they are already configured
+    os.environ.setdefault("GOOGLE_APPLICATION_CREDENTIALS", "path/to/your/service-account-key.json")
+    return texttospeech.TextToSpeechClient()
+
+
+registry.register("tts", _load_client)
+
+
+def get_tts_client():
+    """
+    Return the shared Text-to-Speech client, created on first use.
+    """
+    return registry.get("tts")
+
+
+def split_sentences(text, min_chars=20):
+    """
+    Split text into sentences, merging very short fragments into the previous sentence.
+    """
+    sentences = []
+    for sentence in re.split(r"(?<=[.!?])\s+|\n+", text or ""):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if sentences and len(sentence) < min_chars:
+            sentences[-1] = f"{sentences[-1]} {sentence}"
+        else:
+            sentences.append(sentence)
+    return sentences
+
+
+def synthesize_sentence(text, language_code="en-US", gender="NEUTRAL", encoding="MP3"):
+    """
+    Synthesize one sentence, serving repeats from the audio cache.
+    Returns:
+        bytes: Encoded audio.
+    """
+    from google.cloud import texttospeech
+
+    key = (" ".join(text.split()), language_code, gender, encoding)
+    audio = audio_cache.get(key)
+    if audio is not None:
+        return audio
+
+    with span("tts_synthesize"):
+        response = get_tts_client().synthesize_speech(
+            input=texttospeech.SynthesisInput(text=text),
+            voice=texttospeech.VoiceSelectionParams(
+                language_code=language_code,
+                ssml_gender=texttospeech.SsmlVoiceGender[gender],
+            ),
+            audio_config=texttospeech.AudioConfig(audio_encoding=texttospeech.AudioEncoding[encoding]),
+        )
+    audio_cache.put(key, response.audio_content)
+    return response.audio_content
+
+
+def stream_speech(text, language_code="en-US", gender="NEUTRAL", encoding="MP3"):
+    """
+    Synthesize text sentence by sentence, yielding audio chunks in order as they become ready.
+
+    All sentences are submitted at once, so they are synthesized concurrently,
+    and the first chunk can be played before the rest are done.
+    """
+    futures = [
+        _executor.submit(synthesize_sentence, sentence, language_code, gender, encoding)
+        for sentence in split_sentences(text)
+    ]
+    for future in futures:
+        yield future.result()
+
+
+def synthesize_speech(text, language_code="en-US", gender="NEUTRAL", encoding="MP3"):
+    """
+    Synthesize text to a single audio clip.
+    Returns:
+        bytes: Concatenated audio (MP3 frames play back-to-back).
+    """
+    return b"".join(stream_speech(text, language_code, gender, encoding))
+
+
+def prefetch(phrases, language_code="en-US", gender="NEUTRAL", encoding="MP3"):
+    """
+    Synthesize phrases the avatar speaks often (e.g. disclaimers) into the cache in the background.
+    """
+    return [
+        _executor.submit(synthesize_sentence, sentence, language_code, gender, encoding)
+        for phrase in phrases
+        for sentence in split_sentences(phrase)
+    ]
@@ -0,0 +1,279 @@
+import os
+import time
+
+import cv2
+import numpy as np
+
+from keyframes import frame_histograms, scene_changes
+from metrics import span
+from testbackend import _draw_boxes, detect_objects_yolo_batch
+
+# Longest stretch of a clip that is processed, so long uploads can't hold a worker indefinitely
+MAX_VIDEO_SECONDS = float(os.getenv("MAX_VIDEO_SECONDS", "120"))
+
+
+def box_iou(a, b):
+    """
+    Pairwise IoU between (N, 4) and (M, 4) arrays of [x1, y1, x2, y2] boxes.
+    """
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return intersection / np.maximum(area_a[:, None] + area_b[None, :] - intersection, 1e-6)
+
+
+class BoxTracker:
+    """
+    Associate detections across frames by IoU, falling back to centroid distance, and coast boxes between detections.
+
+    Each track keeps a constant-velocity estimate, so between detection
+    frames its box is moved along without looking at the pixels. Tracks
+    only match detections of the same class, and are dropped after
+    `max_misses` detection rounds without a match.
+
+    The centroid fallback allows `max_center_distance` plus
+    `center_distance_per_frame` for each frame since the track's last
+    detection, in box diagonals, up to `center_distance_limit`.
+
+    Args:
+        iou_threshold (float): Minimum IoU for a match.
+        max_center_distance (float): Centroid fallback right after a detection, as a fraction of the box diagonal.
+        center_distance_per_frame (float): Allowance added per elapsed frame, for prediction error.
+        center_distance_limit (float): Largest centroid distance ever matched.
+        max_misses (int): Detection rounds a track survives unmatched.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_center_distance=0.5, center_distance_per_frame=0.1,
+                 center_distance_limit=1.5, max_misses=2):
+        self.iou_threshold = iou_threshold
+        self.max_center_distance = max_center_distance
+        self.center_distance_per_frame = center_distance_per_frame
+        self.center_distance_limit = center_distance_limit
+        self.max_misses = max_misses
+        self.tracks = []  # active track dicts
+        self.finished = []  # tracks that were dropped
+        self._next_id = 1
+
+    def _predicted_boxes(self, frame_index):
+        if not self.tracks:
+            return np.empty((0, 4), dtype=np.float32)
+        boxes = np.array([track["box"] for track in self.tracks], dtype=np.float32)
+        velocity = np.array([track["velocity"] for track in self.tracks], dtype=np.float32)
+        elapsed = np.array([frame_index - track["last_frame"] for track in self.tracks], dtype=np.float32)
+        shift = velocity * elapsed[:, None]
+        return boxes + np.concatenate([shift, shift], axis=1)
+
+    def _associate(self, predicted, boxes, class_ids, frame_index, centroid=True):
+        track_classes = np.array([track["class_id"] for track in self.tracks], dtype=np.int64)
+        same_class = track_classes[:, None] == class_ids[None, :]
+        iou = np.where(same_class, box_iou(predicted, boxes), 0.0)
+
+        # Centroid distance relative to the track's size, for small or fast objects that no longer overlap
+        centers_t = (predicted[:, :2] + predicted[:, 2:]) / 2
+        centers_d = (boxes[:, :2] + boxes[:, 2:]) / 2
+        diagonal = np.hypot(predicted[:, 2] - predicted[:, 0], predicted[:, 3] - predicted[:, 1])
+        distance = np.linalg.norm(centers_t[:, None] - centers_d[None, :], axis=2) / np.maximum(diagonal[:, None], 1e-6)
+        distance = np.where(same_class, distance, np.inf)
+        # Prediction error grows with the frames coasted (new tracks have no velocity at all), within a hard limit
+        elapsed = np.array([frame_index - track["last_frame"] for track in self.tracks], dtype=np.float32)
+        gate = np.minimum(self.max_center_distance + self.center_distance_per_frame * elapsed,
+                          self.center_distance_limit)
+
+        # Greedy assignment, best IoU first, then nearest centroid for what is left
+        passes = [(iou, iou >= self.iou_threshold)]
+        if centroid:
+            passes.append((-distance, distance <= gate[:, None]))
+        matches = []
+        used_t, used_d = set(), set()
+        for score, eligible in passes:
+            pairs = np.argwhere(eligible)
+            for t, d in pairs[np.argsort(-score[eligible], kind="stable")].tolist():
+                if t in used_t or d in used_d:
+                    continue
+                matches.append((t, d))
+                used_t.add(t)
+                used_d.add(d)
+        return matches
+
+    def update(self, frame_index, timestamp, boxes, class_ids, confidences, names, cut=False):
+        """
+        Match a detection round to the tracks, start tracks for new objects and drop lost ones.
+
+        On a scene cut (`cut`) only overlapping boxes are matched; distant
+        objects in the new shot start fresh tracks instead of continuing old ones.
+        """
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        class_ids = np.asarray(class_ids, dtype=np.int64)
+        predicted = self._predicted_boxes(frame_index)
+        matches = self._associate(predicted, boxes, class_ids, frame_index, centroid=not cut) if len(self.tracks) and len(boxes) else []
+
+        matched_t = {t for t, _ in matches}
+        matched_d = {d for _, d in matches}
+        for t, d in matches:
+            track = self.tracks[t]
+            elapsed = max(frame_index - track["last_frame"], 1)
+            old_center = (np.asarray(track["box"][:2]) + np.asarray(track["box"][2:])) / 2
+            new_center = (boxes[d, :2] + boxes[d, 2:]) / 2
+            # Smoothed per-frame motion, used to coast the box until the next detection
+            track["velocity"] = (0.5 * np.asarray(track["velocity"]) + 0.5 * (new_center - old_center) / elapsed).tolist()
+            track["box"] = boxes[d].tolist()
+            track["last_frame"] = frame_index
+            track["last_seen"] = timestamp
+            track["hits"] += 1
+            track["misses"] = 0
+            track["max_confidence"] = max(track["max_confidence"], float(confidences[d]))
+
+        kept = []
+        for t, track in enumerate(self.tracks):
+            if t not in matched_t:
+                track["misses"] += 1
+                if track["misses"] > self.max_misses:
+                    self.finished.append(track)
+                    continue
+            kept.append(track)
+        self.tracks = kept
+
+        for d in range(len(boxes)):
+            if d in matched_d:
+                continue
+            self.tracks.append({
+                "id": self._next_id,
+                "class_id": int(class_ids[d]),
+                "class": names[int(class_ids[d])],
+                "box": boxes[d].tolist(),
+                "velocity": [0.0, 0.0],
+                "first_seen": timestamp,
+                "last_seen": timestamp,
+                "last_frame": frame_index,
+                "hits": 1,
+                "misses": 0,
+                "max_confidence": float(confidences[d]),
+            })
+            self._next_id += 1
+
+    def visible(self, frame_index):
+        """
+        Return (track, box) pairs for tracks matched in the last detection round, boxes coasted to `frame_index`.
+        """
+        predicted = self._predicted_boxes(frame_index)
+        return [(track, box) for track, box in zip(self.tracks, predicted) if track["misses"] == 0]
+
+    def summary(self):
+        """
+        One entry per track ever seen, in order of appearance.
+        """
+        tracks = sorted(self.finished + self.tracks, key=lambda track: track["id"])
+        return [
+            {
+                "track_id": track["id"],
+                "class": track["class"],
+                "first_seen_sec": round(track["first_seen"], 2),
+                "last_seen_sec": round(track["last_seen"], 2),
+                "detections": track["hits"],
+                "max_confidence": round(track["max_confidence"], 4),
+            }
+            for track in tracks
+        ]
+
+
+def _annotate(frame, visible, max_side):
+    # Downscale before drawing, the UI doesn't need full-resolution frames
+    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    scale = min(1.0, max_side / max(rgb.shape[:2]))
+    if scale < 1:
+        rgb = cv2.resize(rgb, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    boxes = np.array([box for _, box in visible], dtype=np.float32).reshape(-1, 4) * scale
+    annotated = _draw_boxes(rgb, boxes)
+    for (track, _), box in zip(visible, boxes):
+        cv2.putText(annotated, f"#{track['id']} {track['class']}", (int(box[0]), max(int(box[1]) - 5, 12)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 1, cv2.LINE_AA)
+    return annotated
+
+
+def track_video(video_path, detect_every=5, scene_threshold=0.3, conf=0.25, imgsz=640,
+                annotate_every=1, max_side=960, max_duration=MAX_VIDEO_SECONDS, tracker=None):
+    """
+    Detect and track objects in a video, running YOLO only every `detect_every` frames or on a scene change.
+
+    Every frame is decoded, but between detection frames the tracker only
+    coasts the previous boxes. A cut is detected by comparing a 64x64
+    colour histogram of each frame with the one at the last detection, so
+    new scenes get fresh detections right away.
+    Args:
+        video_path (str): Path to the video.
+        detect_every (int): Frames between YOLO runs.
+        scene_threshold (float): Histogram distance that forces a detection, see `keyframes.scene_changes`.
+        conf (float): Minimum detection confidence.
+        imgsz (int): YOLO inference size.
+        annotate_every (int): Render every n-th frame, 0 to render none.
+        max_side (int): Longest side of rendered frames.
+        max_duration (float): Only the first `max_duration` seconds are processed.
+        tracker (BoxTracker): Tracker to use, a default one if None.
+    Yields:
+        dict: Per frame, "frame" (index), "time" (seconds), "detected" (whether YOLO ran),
+        "tracks" (visible tracks), "image" (annotated RGB array or None) and "stats"
+        (frames, detections, scene_cuts, seconds, fps so far). The tracker's
+        `summary` gives the per-track results at the end.
+    """
+    tracker = tracker or BoxTracker()
+    cap = cv2.VideoCapture(video_path)
+    stats = {"frames": 0, "detections": 0, "scene_cuts": 0, "seconds": 0.0, "fps": 0.0}
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        last_frame = int(max_duration * fps) if max_duration else None
+        reference = None  # histogram of the last detection frame
+        since_detection = detect_every
+        started = time.perf_counter()
+        index = 0
+        while last_frame is None or index < last_frame:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            small = cv2.resize(frame, (64, 64), interpolation=cv2.INTER_AREA)[None]
+            histogram = frame_histograms(small)
+            cut = reference is not None and bool(scene_changes(histogram, scene_threshold, reference)[0])
+            detected = since_detection >= detect_every or cut
+            if detected:
+                result = detect_objects_yolo_batch([frame], batch_size=1, imgsz=imgsz, conf=conf, annotate=False)[0]
+                names = {
+                    class_id: detection["class"]
+                    for class_id, detection in zip(result["class_ids"].tolist(), result["detections"])
+                }
+                with span("video_track"):
+                    tracker.update(index, index / fps, result["boxes"], result["class_ids"], result["confidences"], names,
+                                   cut=cut)
+                reference = histogram[0]
+                since_detection = 0
+                stats["detections"] += 1
+                stats["scene_cuts"] += cut
+            since_detection += 1
+
+            visible = tracker.visible(index)
+            image = None
+            if annotate_every and index % annotate_every == 0:
+                with span("video_render"):
+                    image = _annotate(frame, visible, max_side)
+
+            stats["frames"] += 1
+            stats["seconds"] = round(time.perf_counter() - started, 3)
+            stats["fps"] = round(stats["frames"] / stats["seconds"], 2) if stats["seconds"] > 0 else 0.0
+            yield {
+                "frame": index,
+                "time": round(index / fps, 2),
+                "detected": detected,
+                "tracks": [
+                    {"track_id": track["id"], "class": track["class"], "box": np.round(box, 1).tolist()}
+                    for track, box in visible
+                ],
+                "image": image,
+                "stats": dict(stats),
+            }
+            index += 1
+    finally:
+        cap.release()